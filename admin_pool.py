@@ -0,0 +1,91 @@
+# admin_pool.py
+import heapq
+import itertools
+
+from config import ADMIN_CAPACITY
+
+
+class AdminPool:
+    """Online admins ordered by how many orders they are handling.
+
+    The heap holds (load, seq, admin) entries. Every load or status
+    change pushes a fresh entry and leaves the old one behind as stale;
+    stale entries are dropped when they reach the top. Picking the
+    least-loaded admin is therefore O(log n) and nothing ever rescans
+    the full admin list. With a capacity set, an admin holding that many
+    orders is saturated; once the least-loaded one is, everyone is.
+    """
+
+    def __init__(self, capacity=ADMIN_CAPACITY):
+        self.capacity = capacity  # Open orders per admin; 0 = no limit
+        self.online = set()
+        self.load = {}        # Admin ID -> in-flight orders (online or not)
+        self.latest = {}      # Admin ID -> seq of its current heap entry
+        self.heap = []
+        self.seq = itertools.count()
+
+    def __len__(self):
+        return len(self.online)
+
+    def is_online(self, admin_id):
+        return admin_id in self.online
+
+    def online_admins(self):
+        return list(self.online)
+
+    def set_online(self, admin_id):
+        self.online.add(admin_id)
+        self._push(admin_id)
+
+    def set_offline(self, admin_id):
+        self.online.discard(admin_id)
+        self.latest.pop(admin_id, None)
+
+    def add_load(self, admin_id, n=1):
+        self.load[admin_id] = self.load.get(admin_id, 0) + n
+        if admin_id in self.online:
+            self._push(admin_id)
+
+    def release(self, admin_id):
+        """One in-flight order of this admin finished or moved away"""
+        if self.load.get(admin_id, 0) > 0:
+            self.add_load(admin_id, -1)
+
+    def assign(self, exclude=()):
+        """Least-loaded online admin not in `exclude`, charged one order.
+
+        None when nobody is online or everyone is at capacity.
+        """
+        skipped = []
+        chosen = None
+        while self.heap:
+            load, seq, admin_id = heapq.heappop(self.heap)
+            if self.latest.get(admin_id) != seq:
+                continue              # Stale entry
+            if admin_id in exclude:
+                skipped.append((load, seq, admin_id))
+                continue
+            if self._saturated(load):
+                skipped.append((load, seq, admin_id))
+                break
+            chosen = admin_id
+            break
+
+        for entry in skipped:
+            heapq.heappush(self.heap, entry)
+        if chosen is None:
+            return None
+
+        self.add_load(chosen)
+        return chosen
+
+    def _saturated(self, load):
+        return self.capacity > 0 and load >= self.capacity
+
+    def _push(self, admin_id):
+        seq = next(self.seq)
+        self.latest[admin_id] = seq
+        heapq.heappush(self.heap, (self.load.get(admin_id, 0), seq, admin_id))
+        if len(self.heap) > 4 * len(self.online) + 64:
+            self.heap = [e for e in self.heap if self.latest.get(e[2]) == e[1]]
+            heapq.heapify(self.heap)
@@ -0,0 +1,174 @@
+# admission.py
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+from config import (
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_MAX_WAIT,
+    ADMISSION_WINDOW,
+    ADMISSION_REFRESH,
+)
+
+
+class Waiting:
+    """A finished order form that has no admin (and no token) yet"""
+
+    __slots__ = ("uid", "data", "payment", "since", "number", "message_id",
+                 "shown")
+
+    def __init__(self, uid, data, payment, since, number):
+        self.uid = uid
+        self.data = data
+        self.payment = payment
+        self.since = since
+        self.number = number     # Ticket number; position = number - left
+        self.message_id = None   # Status message, once it has been sent
+        self.shown = None        # Text last put in that message
+
+    def sent(self, future):
+        """Done-callback for the status message's outbox future"""
+        if not future.cancelled() and future.exception() is None:
+            self.message_id = future.result().message_id
+
+
+class AdmissionQueue:
+    """Orders waiting for admin capacity, first come first served.
+
+    A waiting order holds no token and no admin slot; both are taken
+    only when dispatch() manages to place it. One task drains the head
+    of the line whenever kick() reports capacity may have appeared, and
+    every ADMISSION_REFRESH seconds re-announces positions and ETAs.
+    ETAs come from how many orders admins accepted over the last
+    ADMISSION_WINDOW seconds. Orders only ever leave from the head, so
+    a position is a ticket number minus how many have left: O(1).
+    """
+
+    def __init__(self, dispatch, announce, failed, maxsize=ADMISSION_QUEUE_SIZE,
+                 max_wait=ADMISSION_MAX_WAIT, window=ADMISSION_WINDOW,
+                 refresh=ADMISSION_REFRESH):
+        self.dispatch = dispatch    # async (waiting) -> False when nobody is free
+        self.announce = announce    # (waiting, position, eta seconds or None)
+        self.failed = failed        # (waiting), when dispatch raised for it
+        self.maxsize = maxsize
+        self.max_wait = max_wait
+        self.window = window
+        self.refresh = refresh
+        self.waiting = OrderedDict()  # Customer ID -> Waiting, in line order
+        self.accepts = deque()        # Accept times within the window
+        self.joined = 0               # Tickets handed out
+        self.left = 0                 # Orders gone from the head of the line
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def __len__(self):
+        return len(self.waiting)
+
+    def __contains__(self, uid):
+        return uid in self.waiting
+
+    # ---------- line ----------
+    def offer(self, uid, data, payment, now=None):
+        """Queue an order; returns its position, or None when the line is full.
+
+        A customer who is already waiting keeps their place with the
+        newer order.
+        """
+        entry = self.waiting.get(uid)
+        if entry is not None:
+            entry.data, entry.payment = data, payment
+        elif len(self.waiting) >= self.maxsize:
+            return None
+        else:
+            self.joined += 1
+            entry = Waiting(uid, data, payment,
+                            time.time() if now is None else now, self.joined)
+            self.waiting[uid] = entry
+        return self.position(uid)
+
+    def position(self, uid):
+        entry = self.waiting.get(uid)
+        return entry.number - self.left if entry else None
+
+    def _pop_head(self):
+        self.left += 1
+        return self.waiting.popitem(last=False)[1]
+
+    def expire(self, now):
+        """Remove and return orders that waited longer than max_wait"""
+        expired = []
+        for entry in list(self.waiting.values()):
+            if now - entry.since < self.max_wait:
+                break                 # Line order is arrival order
+            expired.append(self._pop_head())
+        if expired:
+            self.kick()
+        return expired
+
+    # ---------- throughput ----------
+    def accepted(self, now=None):
+        """An admin accepted an order; feeds the ETA estimate"""
+        self.accepts.append(time.time() if now is None else now)
+
+    def rate(self, now):
+        """Accepts per second over the window, None until there are any"""
+        while self.accepts and now - self.accepts[0] > self.window:
+            self.accepts.popleft()
+        if not self.accepts:
+            return None
+        span = min(self.window, max(now - self.accepts[0], 60))
+        return len(self.accepts) / span
+
+    def eta(self, position, now):
+        rate = self.rate(now)
+        return position / rate if rate else None
+
+    # ---------- dispatch ----------
+    def kick(self):
+        """Capacity may have appeared (admin online, order finished)"""
+        self.wakeup.set()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def _announce_all(self):
+        now = time.time()
+        rate = self.rate(now)
+        for entry in self.waiting.values():
+            position = entry.number - self.left
+            self.announce(entry, position, position / rate if rate else None)
+
+    async def _run(self):
+        # Positions shift on every dispatch; editing each waiting customer's
+        # message that often would swamp the outbox, so only announce on a tick
+        next_announce = time.monotonic() + self.refresh
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(), max(next_announce - time.monotonic(), 0)
+                )
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()  # Kicks from here on wake the next round
+
+            while self.waiting:
+                entry = next(iter(self.waiting.values()))
+                try:
+                    placed = await self.dispatch(entry)
+                except Exception as e:
+                    print(f"⚠️ Admission dispatch failed for {entry.uid}: {e}")
+                    self.failed(entry)
+                    placed = True     # Drop it rather than retry forever
+                if not placed:
+                    break
+                if self.waiting.get(entry.uid) is entry:  # Not expired meanwhile
+                    self._pop_head()
+
+            if time.monotonic() >= next_announce:
+                self._announce_all()
+                next_announce = time.monotonic() + self.refresh
@@ -0,0 +1,59 @@
+# bench_dispatch.py
+# Message routing cost as the number of states/buttons grows: the
+# Conversation table vs. an if-chain that checks every feature in turn.
+#   python bench_dispatch.py [messages]
+import sys
+import time
+
+from conversation import Conversation
+
+
+async def noop(update, context, text):
+    pass
+
+
+def build_table(features):
+    conv = Conversation(default_timeout=1800)
+    for i in range(features):
+        conv.step(f"state_{i}")(noop)
+        conv.button("admin", f"button_{i}")(noop)
+    return conv
+
+
+def build_chain(features):
+    # Roughly what the old messages() did: test each feature in order
+    checks = []
+    for i in range(features):
+        checks.append(lambda ud, text, i=i: ud.get("state") == f"state_{i}")
+        checks.append(lambda ud, text, i=i: text == f"button_{i}")
+    return checks
+
+
+def bench(fn, messages):
+    start = time.perf_counter()
+    for _ in range(messages):
+        fn()
+    took = time.perf_counter() - start
+    return f"{took / messages * 1e9:>10.0f} ns"
+
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    print(f"{'features':>8}  {'table':>13}  {'if-chain':>13}")
+    for features in (10, 100, 1000):
+        conv = build_table(features)
+        chain = build_chain(features)
+        # Worst case for the chain: the user is in the last state
+        user_data = {}
+        Conversation.enter(user_data, f"state_{features - 1}")
+
+        table = bench(
+            lambda: conv.route("customer", "hello", user_data, lambda: None),
+            messages,
+        )
+        linear = bench(
+            lambda: next(c for c in chain if c(user_data, "hello")),
+            messages // 10,
+        )
+        print(f"{features:>8}  {table}  {linear}")
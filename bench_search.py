@@ -0,0 +1,132 @@
+# bench_search.py
+# Inline order search: the prefix/trigram index vs. scanning every order.
+#   python bench_search.py [orders]
+import random
+import sys
+import time
+import tracemalloc
+
+from search import OrderIndex, words
+
+FIRST = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya",
+         "Rohan", "Saanvi", "Arjun", "Meera", "Kabir", "Priya", "Rahul",
+         "Sneha", "Vikram", "Neha", "Karan", "Pooja", "Manish"]
+LAST = ["Sharma", "Verma", "Iyer", "Reddy", "Nair", "Gupta", "Mehta",
+        "Singh", "Patel", "Khan", "Das", "Joshi", "Rao", "Kapoor", "Bose"]
+AREAS = ["Indiranagar", "Koramangala", "Andheri West", "Salt Lake",
+         "Banjara Hills", "Powai", "Whitefield", "Vasant Kunj", "Baner",
+         "Anna Nagar", "Gachibowli", "Malviya Nagar", "HSR Layout"]
+CITIES = ["Bengaluru", "Mumbai", "Kolkata", "Hyderabad", "Pune", "Delhi",
+          "Chennai"]
+BANKS = ["okaxis", "okhdfcbank", "okicici", "ybl", "paytm", "upi"]
+ADMINS = [1001, 1002, 1003, 1004, 1005, 1006, 1007, 1008]
+
+
+def make_order(token, rng):
+    first, last = rng.choice(FIRST), rng.choice(LAST)
+    if rng.random() < 0.4:
+        address = f"https://maps.app.goo.gl/{rng.getrandbits(40):x}"
+    else:
+        address = (f"{rng.randint(1, 999)}, {rng.randint(1, 40)}th Cross, "
+                   f"{rng.choice(AREAS)}, {rng.choice(CITIES)}")
+    upi = None
+    if rng.random() < 0.5:
+        upi = f"{first.lower()}{rng.randint(1, 9999)}@{rng.choice(BANKS)}"
+    return {
+        "status": rng.choice(("pending", "accepted")),
+        "assigned_admin": rng.choice(ADMINS),
+        "customer": {
+            "id": 10**9 + token, "name": f"{first} {last}",
+            "address": address, "final": rng.randint(100, 900),
+            "payment": "prepaid" if upi else "cod", "upi": upi,
+        },
+    }
+
+
+def scan(orders, query, limit=20, admin=None):
+    # What a search without the index would do: test every order
+    terms = words(query)
+    hits = []
+    for token in sorted(orders, reverse=True):
+        order = orders[token]
+        if admin is not None and order["assigned_admin"] != admin:
+            continue
+        cust = order["customer"]
+        text = " " + " ".join(words(f"{token} {cust['name']} {cust['address']} "
+                                    f"{cust.get('upi') or ''}"))
+        if all((" " + t if len(t) < 3 else t) in text for t in terms):
+            hits.append(token)
+            if len(hits) == limit:
+                break
+    return hits
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(7)
+    orders = {token: make_order(token, rng) for token in range(1, count + 1)}
+    sample = orders[count // 2]["customer"]
+
+    index = OrderIndex(keep_recent=count)
+    start = time.perf_counter()
+    for token, order in orders.items():
+        index.add(token, order)
+    took = time.perf_counter() - start
+
+    tracemalloc.start()           # Separate run: tracing slows indexing ~10x
+    traced = OrderIndex(keep_recent=count)
+    for token, order in orders.items():
+        traced.add(token, order)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced
+    print(f"Indexed {count:,} orders in {took:.2f}s "
+          f"({count / took:,.0f}/sec, {took / count * 1e6:.1f} µs each), "
+          f"{size / 2**20:.1f} MB ({size / count:.0f} B/order), "
+          f"{len(index.postings):,} keys")
+
+    queries = [
+        ("token", str(count // 2), None),
+        ("token prefix", str(count // 2)[:2], None),
+        ("name prefix", sample["name"][:2], None),
+        ("full name", sample["name"], None),
+        ("area", "koraman", None),
+        ("area + city", "powai mumbai", None),
+        ("upi", f"{sample['upi'] or 'rahul12@ybl'}", None),
+        ("no match", "zzqx", None),
+        ("admin, empty", "", ADMINS[0]),
+        ("admin + name", "meera", ADMINS[0]),
+    ]
+    print(f"\n{'query':<14}{'index p50':>12}{'p99':>10}{'scan p50':>12}"
+          f"{'speedup':>10}  hits")
+    for name, query, admin in queries:
+        hits = index.search(query, admin=admin)
+        expected = scan(orders, query, admin=admin)
+        # Same newest matches, except that a token typed in full comes first
+        extra = set(hits) - set(expected)
+        assert extra <= ({int(query)} if query.isdecimal() else set()), name
+        assert len(set(expected) - set(hits)) <= len(extra), name
+        p50, p99 = timed(lambda: index.search(query, admin=admin), 200)
+        s50, _ = timed(lambda: scan(orders, query, admin=admin), 3)
+        print(f"{name:<14}{p50 * 1e3:>9.3f} ms{p99 * 1e3:>7.3f} ms"
+              f"{s50 * 1e3:>9.1f} ms{s50 / p50:>9.0f}x  {len(hits)}")
+
+    # Finishing orders keeps them as recent ones; past keep_recent they are
+    # dropped and their postings compacted away
+    index.keep_recent = count // 2
+    start = time.perf_counter()
+    for token in range(1, count + 1):
+        index.retire(token)
+    took = time.perf_counter() - start
+    print(f"\nRetired {count:,} orders in {took:.2f}s "
+          f"(incl. compaction), {len(index):,} still searchable")
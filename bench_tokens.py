@@ -0,0 +1,57 @@
+# bench_tokens.py
+# Tokens/sec: the old per-order commit vs. leased blocks.
+#   python bench_tokens.py [count] [workers]
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import database
+from tokens import TokenSequencer
+
+
+def per_order_commit(path, count):
+    # Same connection setup utils.py had: default journal, commit per token
+    conn = sqlite3.connect(path)
+    database.init_db(conn)
+    cursor = conn.cursor()
+    out = []
+    for _ in range(count):
+        cursor.execute("SELECT last_token FROM token_counter WHERE id=1")
+        last_token = cursor.fetchone()[0] + 1
+        cursor.execute("UPDATE token_counter SET last_token=? WHERE id=1", (last_token,))
+        conn.commit()
+        out.append(last_token)
+    return out
+
+
+def leased(path, count):
+    seq = TokenSequencer(path)
+    return [seq.take() for _ in range(count)]
+
+
+def run(name, fn, path, count):
+    start = time.perf_counter()
+    fn(path, count)
+    took = time.perf_counter() - start
+    print(f"{name:<18} {count / took:>12,.0f} tokens/sec")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run("per-order commit", per_order_commit, os.path.join(tmp, "a.db"), count)
+        run("leased blocks", leased, os.path.join(tmp, "b.db"), count)
+
+        # Several workers leasing from one database must never collide
+        path = os.path.join(tmp, "c.db")
+        database.connect(path).close()
+        with Pool(workers) as pool:
+            chunks = pool.starmap(leased, [(path, count // workers)] * workers)
+        issued = [t for chunk in chunks for t in chunk]
+        print(f"{workers} workers: {len(issued)} tokens, "
+              f"unique={len(issued) == len(set(issued))}")
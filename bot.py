@@ -1,59 +1,187 @@
+import time
+STARTED = time.perf_counter()  # Before the heavy imports, to time cold starts
+
 import asyncio
+import os
+import tempfile
 from telegram import (
     Update,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
     ReplyKeyboardMarkup,
     ReplyKeyboardRemove,
 )
+from telegram.error import TelegramError
 from telegram.ext import (
     ApplicationBuilder,
+    ApplicationHandlerStop,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
+    InlineQueryHandler,
+    TypeHandler,
     ContextTypes,
     filters,
 )
 
-from config import BOT_TOKEN, MAIN_ADMIN_ID, BOT_NAME
+from config import (
+    BOT_TOKEN,
+    MAIN_ADMIN_ID,
+    BOT_NAME,
+    UPDATE_MODE,
+    WEBHOOK_QUEUE_SIZE,
+    CONCURRENT_UPDATES,
+    ESCALATION_TIMEOUTS,
+    ESCALATION_MAX_ROUNDS,
+    WORKER_ID,
+    STATE_TIMEOUT,
+    BOT_API_URL,
+    METRICS_HOST,
+    METRICS_PORT,
+    POLL_TIMEOUT,
+    USER_IDLE_TTL,
+    TRACKING_TTL,
+    CHAT_TTL,
+    ORDER_TTL,
+    ADMIN_DIGEST,
+    RECORD_PATH,
+)
+import metrics
+import transport
+from admin_pool import AdminPool
+from admission import AdmissionQueue
+from conversation import Conversation
+from digest import AdminDigest
+from journal import Journal, day_range, export
+from order_store import OrderStore
+from pricing import PriceRules, bulk_quote
+from processor import PerChatUpdateProcessor
+from ratelimit import UpdateLimiter
+from recorder import UpdateRecorder
+from relay import ChatRelay
+from profiles import ProfileCache
+from outbox import Outbox, PRIORITY_ADMIN, PRIORITY_CUSTOMER
+from scheduler import DeadlineScheduler
+from sessions import Sweeper
+from state import SharedMap, make_backend
+from tokens import TokenSequencer
+from transcripts import TranscriptStore, render
+
+startup = {"imports": time.perf_counter()}  # Phase -> perf_counter at its end
 
 # ================= GLOBALS =================
-ADMINS = {
-    MAIN_ADMIN_ID: {
-        "role": "main",
-        "status": "online",
-        "login_time": 0
-    }
-}
+# Shared with other workers when STATE_BACKEND=sqlite. Values read from
+# these maps are copies: write them back after changing them.
+state = make_backend()
+ADMINS = SharedMap(state, "admins", mirrored=True)
+ADMINS.setdefault(MAIN_ADMIN_ID, {
+    "role": "main",
+    "status": "online",
+    "login_time": 0
+})
+
+tokens = TokenSequencer()
+outbox = Outbox()  # Rate-limited sender for everything not replying in-place
+active_orders = OrderStore()  # Token -> order, persisted to the orders table
+journal = Journal()           # Append-only log of order lifecycle events
+tracking_wait = SharedMap(state, "tracking_wait", mirrored=True)  # Admin ID -> Token
+admin_pool = AdminPool()  # Online admins by in-flight load
+profiles = ProfileCache()  # User ID -> display name, from incoming updates
+sessions = Sweeper()       # Expires idle flows, chats and stale orders
+digest = AdminDigest(outbox)  # Batched order boards, when ADMIN_DIGEST is on
+relay = ChatRelay(outbox)     # Copies chat-tunnel messages to the other side
+transcripts = TranscriptStore()  # Token -> chat lines, compressed on disk
+pricing = PriceRules()        # Compiled discount tiers, promos and caps
+recorder = UpdateRecorder() if RECORD_PATH else None
+limiter = UpdateLimiter()     # Per-user token buckets for incoming updates
+admins_version = None     # ADMINS version admin_pool was last synced to
+
+CHAT_SESSIONS = SharedMap(state, "chat_sessions", mirrored=True)  # User ID <-> Recipient ID
+USER_TOKENS = SharedMap(state, "user_tokens", mirrored=True)      # Customer ID -> Token
 
-token_counter = 0
-active_orders = {}
-tracking_wait = {}  # Admin ID -> Token
-current_admin_turn = 0
 
-CHAT_SESSIONS = {}  # User ID <-> Recipient ID
-USER_TOKENS = {}    # Customer ID -> Token
+# ================= HELPERS =================
+async def generate_token():
+    return await tokens.next()
 
 
-# ================= HELPERS =================
-def generate_token():
-    global token_counter
-    token_counter += 1
-    return token_counter
+def escalation_deadline(order):
+    timeouts = ESCALATION_TIMEOUTS
+    return time.time() + timeouts[min(order["round"], len(timeouts) - 1)]
 
 
-def calculate_final(item, gst):
-    return round((item * 0.5) + gst, 2)
+def sync_admin_pool():
+    """Pick up Online/Offline changes made by other workers"""
+    global admins_version
+    version = ADMINS.version()
+    if version == admins_version:
+        return
+    admins_version = version
+    admins = dict(ADMINS.items())
+    for aid, info in admins.items():
+        if info.get("role") != "admin":
+            continue
+        online = info.get("status") == "online"
+        if online and not admin_pool.is_online(aid):
+            admin_pool.set_online(aid)
+        elif not online and admin_pool.is_online(aid):
+            admin_pool.set_offline(aid)
+    # Admins removed on another worker are gone from ADMINS altogether
+    for aid in admin_pool.online_admins():
+        if admins.get(aid, {}).get("role") != "admin":
+            admin_pool.set_offline(aid)
+
+
+def reassign(order):
+    """Move an order to the least-loaded other online admin, if there is
+    one; False if it stays where it is"""
+    sync_admin_pool()
+    current = order["assigned_admin"]
+    nxt = admin_pool.assign(exclude=(current,))
+    if nxt is None:
+        return False
+    admin_pool.release(current)
+    order["assigned_admin"] = nxt
+    return True
+
+
+# ================= RATE LIMIT =================
+async def rate_limit(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Drop the update before any other handler sees it when its sender
+    is over their role's rate"""
+    user = update.effective_user
+    if user is None:
+        return
+    role = role_of(user.id)
+    allowed, warn = limiter.allow(user.id, role)
+    if allowed:
+        return
+    metrics.updates_limited.inc(role)
+    if update.callback_query:
+        # Unanswered, the button would spin until Telegram gives up on it
+        try:
+            await update.callback_query.answer("⏳ Too fast, try again in a moment")
+        except TelegramError:
+            pass
+    if warn:
+        outbox.send_message(
+            user.id, "⏳ You're sending messages too fast. "
+            "Please wait a moment; messages sent meanwhile were ignored."
+        )
+    raise ApplicationHandlerStop
 
 
-def get_online_admins():
-    return [
-        aid for aid, info in ADMINS.items()
-        if info.get("role") == "admin" and info.get("status") == "online"
-    ]
+# ================= PROFILES =================
+async def remember_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user:
+        profiles.remember(update.effective_user)
+        sessions.touch("user", update.effective_user.id)
 
 
 # ================= START =================
+@metrics.timed("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     context.user_data.clear()
@@ -61,7 +189,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if uid == MAIN_ADMIN_ID:
         kb = [
             ["Add New Admin ➕", "Remove Admin ➖"],
-            ["📊 Admin Status"]
+            ["📊 Admin Status", "📈 Report"]
         ]
         await update.message.reply_text(
             "👑 Main Admin Panel",
@@ -69,8 +197,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    if uid in ADMINS:
-        ADMINS[uid]["login_time"] = asyncio.get_event_loop().time()
+    info = ADMINS.get(uid)
+    if info:
+        info["login_time"] = time.time()
+        ADMINS[uid] = info
         kb = [["Online ✅", "Offline ❌"]]
         await update.message.reply_text(
             "👋 Admin Panel",
@@ -88,315 +218,616 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+# ================= CONVERSATION =================
+conversation = Conversation(default_timeout=STATE_TIMEOUT)
+
+def role_of(uid):
+    if uid == MAIN_ADMIN_ID:
+        return "main"
+    info = ADMINS.get(uid)
+    if info and info.get("role") == "admin":
+        return "admin"
+    return "customer"
+
+
+def implicit_state(uid):
+    """State for users who are not in a flow of their own"""
+    if uid in tracking_wait:
+        return "tracking"
+    if uid in CHAT_SESSIONS:
+        return "chat"
+    return None
+
+
+def parse_amount(text):
+    """Amount typed by the user, or None if it is not a number"""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
 # ================= BUTTONS =================
+@metrics.timed("buttons")
 async def buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
 
     if q.data == "order":
         context.user_data.clear()
-        context.user_data["mode"] = "order"
         context.user_data["data"] = {}
+        conversation.enter(context.user_data, "order_address")
         await q.message.reply_text("📍 Send delivery address link:")
 
     elif q.data == "price":
         context.user_data.clear()
-        context.user_data["mode"] = "price"
         context.user_data["data"] = {}
-        await q.message.reply_text("💵 Enter item total (minimum ₹149):")
+        conversation.enter(context.user_data, "price_item")
+        await q.message.reply_text(f"💵 Enter item total (minimum ₹{pricing.min_order:g}):")
 
     elif q.data in ["cod", "prepaid"]:
+        # Stale or repeated taps must not place the order twice
+        if context.user_data.get("state") != "order_payment":
+            return
         context.user_data["payment_mode"] = q.data
         if q.data == "cod":
             await finalize_order(context, q.from_user.id)
         else:
+            conversation.enter(context.user_data, "order_upi")
             await q.message.reply_text("👛 Enter UPI ID:")
 
 
 # ================= MESSAGE HANDLER =================
+@metrics.timed("messages")
 async def messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     text = update.message.text.strip() if update.message.text else ""
 
-    # 1. TRACKING LINK SUBMISSION
-    if uid in tracking_wait:
-        token = tracking_wait.pop(uid)
-        order = active_orders.get(token)
-
-        if order:
-            cust_id = order["customer"]["id"]
-            delivery_msg = (
-                f"🚚 **Order Dispatched!**\n\n"
-                f"Your tracking link is here:\n{text}\n\n"
-                f"🙏 Thank you for ordering with {BOT_NAME}!"
-            )
-            await context.bot.send_message(
-                cust_id,
-                delivery_msg,
-                parse_mode="Markdown"
-            )
+    handler, expired = conversation.route(
+        role_of(uid), text, context.user_data, lambda: implicit_state(uid)
+    )
+    if expired:
+        await update.message.reply_text(
+            "⌛ Session expired. Send /start to begin again."
+        )
+        return
+    if handler:
+        await handler(update, context, text)
 
-            CHAT_SESSIONS.pop(uid, None)
-            CHAT_SESSIONS.pop(cust_id, None)
-            USER_TOKENS.pop(cust_id, None)
 
-            await update.message.reply_text(
-                f"✅ Token {token} completed. Tracking sent and Chat closed."
-            )
+# ---------- tracking link submission ----------
+@conversation.step("tracking", timeout=None)
+async def tracking_step(update, context, text):
+    uid = update.effective_user.id
+    if not text:
+        await update.message.reply_text("🔗 Send the tracking link as text:")
+        return
+    token = tracking_wait.pop(uid, None)
+    order = await active_orders.fetch(token) if token is not None else None
+    if not order:
+        return
+
+    cust_id = order["customer"]["id"]
+    delivery_msg = (
+        f"🚚 **Order Dispatched!**\n\n"
+        f"Your tracking link is here:\n{text}\n\n"
+        f"🙏 Thank you for ordering with {BOT_NAME}!"
+    )
+    outbox.send_message(
+        cust_id,
+        delivery_msg,
+        priority=PRIORITY_CUSTOMER,
+        parse_mode="Markdown"
+    )
+
+    journal.record("tracking_sent", token, admin=uid, customer=cust_id)
+    transcripts.note(token, "admin", "tracking", text)
+    transcripts.finish(token)
+
+    CHAT_SESSIONS.pop(uid, None)
+    CHAT_SESSIONS.pop(cust_id, None)
+    USER_TOKENS.pop(cust_id, None)
 
-            if token in active_orders:
-                del active_orders[token]
+    await update.message.reply_text(
+        f"✅ Token {token} completed. Tracking sent and Chat closed."
+    )
+
+    admin_pool.release(order["assigned_admin"])
+    admission.kick()
+    active_orders.complete(token)
+    journal.record(
+        "completed", token, admin=uid, customer=cust_id,
+        final=order["customer"]["final"]
+    )
+
+
+# ---------- chat tunnel ----------
+@conversation.step("chat", timeout=None)
+async def chat_step(update, context, text):
+    uid = update.effective_user.id
+    recipient_id = CHAT_SESSIONS.get(uid)
+    if recipient_id is None:
+        return
+    sessions.touch("chat", uid)
+    sessions.touch("chat", recipient_id)
+
+    role = "customer" if role_of(uid) == "customer" else "admin"
+    token = USER_TOKENS.get(uid if role == "customer" else recipient_id)
+    header = f"💬 {role.capitalize()} · Token {token or 'N/A'}"
+    relay.relay(uid, update.message, recipient_id, header)
+    if token is not None:
+        transcripts.add(token, role, update.message)
+
+
+# ---------- price checking ----------
+@conversation.step("price_item")
+async def price_item_step(update, context, text):
+    item = parse_amount(text)
+    if item is None:
+        await update.message.reply_text("❌ Enter valid amount")
         return
+    if item < pricing.min_order:
+        await update.message.reply_text(
+            f"❌ Minimum item total is ₹{pricing.min_order:g}"
+        )
+        return
+    context.user_data["data"]["item"] = item
+    conversation.enter(context.user_data, "price_gst")
+    await update.message.reply_text("🧾 Enter GST:")
 
-    # 2. CHAT TUNNEL
-    if uid in CHAT_SESSIONS:
-        recipient_id = CHAT_SESSIONS[uid]
-        is_admin = uid in ADMINS or uid == MAIN_ADMIN_ID
 
-        if is_admin:
-            prefix = "💬 **Admin:**"
-        else:
-            token_id = USER_TOKENS.get(uid, "N/A")
-            prefix = f"💬 **Customer (Token {token_id}):**"
-
-        if update.message.text:
-            await context.bot.send_message(
-                recipient_id,
-                f"{prefix}\n{text}",
-                parse_mode="Markdown"
-            )
-        elif update.message.photo:
-            await context.bot.send_photo(
-                recipient_id,
-                update.message.photo[-1].file_id,
-                caption=prefix
-            )
+@conversation.step("price_gst")
+async def price_gst_step(update, context, text):
+    gst = parse_amount(text)
+    if gst is None:
+        await update.message.reply_text("❌ Enter valid GST")
         return
+    data = context.user_data["data"]
+    quote = pricing.quote(data["item"], gst, customer=update.effective_user.id)
+    await update.message.reply_text(
+        f"💰 Final Price:\n"
+        f"Item: ₹{data['item']}\n"
+        f"GST: ₹{gst}\n"
+        f"➡️ Total: ₹{quote.final}"
+    )
+    conversation.leave(context.user_data)
 
-    # 3. PRICE CHECKING
-    if context.user_data.get("mode") == "price":
-        data = context.user_data["data"]
-
-        if "item" not in data:
-            try:
-                item = float(text)
-                if item < 149:
-                    await update.message.reply_text(
-                        "❌ Minimum item total is ₹149"
-                    )
-                    return
-                data["item"] = item
-                await update.message.reply_text("🧾 Enter GST:")
-            except:
-                await update.message.reply_text("❌ Enter valid amount")
-            return
 
-        if "gst" not in data:
-            try:
-                gst = float(text)
-                data["gst"] = gst
-                final = calculate_final(data["item"], gst)
-                await update.message.reply_text(
-                    f"💰 Final Price:\n"
-                    f"Item: ₹{data['item']}\n"
-                    f"GST: ₹{gst}\n"
-                    f"➡️ Total: ₹{final}"
-                )
-                context.user_data.clear()
-            except:
-                await update.message.reply_text("❌ Enter valid GST")
-            return
+# ---------- main admin controls ----------
+@conversation.button("main", "Add New Admin ➕")
+async def add_admin_button(update, context, text):
+    context.user_data.clear()
+    conversation.enter(context.user_data, "add_admin")
+    await update.message.reply_text("📩 Send Telegram User ID:")
 
-    # 4. MAIN ADMIN CONTROLS
-    if uid == MAIN_ADMIN_ID:
-        if text == "Add New Admin ➕":
-            context.user_data["add_admin"] = True
-            await update.message.reply_text("📩 Send Telegram User ID:")
-            return
 
-        if text == "Remove Admin ➖":
-            context.user_data["remove_admin"] = True
-            await update.message.reply_text("📩 Send Admin Telegram ID:")
-            return
+@conversation.button("main", "Remove Admin ➖")
+async def remove_admin_button(update, context, text):
+    context.user_data.clear()
+    conversation.enter(context.user_data, "remove_admin")
+    await update.message.reply_text("📩 Send Admin Telegram ID:")
 
-        if text == "📊 Admin Status":
-            online = [
-                str(aid) for aid, info in ADMINS.items()
-                if info.get("role") == "admin" and info["status"] == "online"
-            ]
-            offline = [
-                str(aid) for aid, info in ADMINS.items()
-                if info.get("role") == "admin" and info["status"] == "offline"
-            ]
-            msg = (
-                f"📊 *Admin Status*\n\n"
-                f"🟢 Online ({len(online)})\n" +
-                ("\n".join(online) or "None") +
-                f"\n\n🔴 Offline ({len(offline)})\n" +
-                ("\n".join(offline) or "None")
-            )
-            await update.message.reply_text(msg, parse_mode="Markdown")
-            return
 
-        if context.user_data.get("add_admin"):
-            try:
-                aid = int(text)
-                ADMINS[aid] = {
-                    "role": "admin",
-                    "status": "offline",
-                    "login_time": 0
-                }
-                await update.message.reply_text(f"✅ Admin added: {aid}")
-            except:
-                await update.message.reply_text("❌ Invalid ID")
-            context.user_data.clear()
-            return
+@conversation.button("main", "📊 Admin Status")
+async def admin_status_button(update, context, text):
+    admins = [
+        (aid, info) for aid, info in ADMINS.items()
+        if info.get("role") == "admin"
+    ]
+    online = [
+        str(aid) for aid, info in admins if info["status"] == "online"
+    ]
+    offline = [
+        str(aid) for aid, info in admins if info["status"] == "offline"
+    ]
+    msg = (
+        f"📊 *Admin Status*\n\n"
+        f"🟢 Online ({len(online)})\n" +
+        ("\n".join(online) or "None") +
+        f"\n\n🔴 Offline ({len(offline)})\n" +
+        ("\n".join(offline) or "None")
+    )
+    await update.message.reply_text(msg, parse_mode="Markdown")
 
-    # 5. ADMIN STATUS UPDATE
-    if uid in ADMINS and ADMINS[uid]["role"] == "admin":
-        if text in ["Online ✅", "Offline ❌"]:
-            ADMINS[uid]["status"] = (
-                "online" if "Online" in text else "offline"
-            )
-            await update.message.reply_text(
-                "✅ Status updated",
-                reply_markup=ReplyKeyboardRemove()
-            )
-            return
 
-    # 6. FOOD ORDER FLOW
-    if context.user_data.get("mode") == "order":
-        data = context.user_data["data"]
+@conversation.button("main", "📈 Report")
+async def report_button(update, context, text):
+    days, admins = await active_orders.report()
+    if not days:
+        await update.message.reply_text("📈 No orders in the last 7 days.")
+        return
 
-        if "address" not in data:
-            data["address"] = text
-            await update.message.reply_text("📸 Send food/card image")
-            return
+    msg = "📈 Last 7 days\n\n"
+    for day, orders, accepted, completed, revenue, accept_seconds in days:
+        avg = f"{accept_seconds / accepted:.0f}s" if accepted else "-"
+        msg += (
+            f"{day}: {orders} placed, {accepted} accepted, "
+            f"{completed} done, ₹{revenue:.2f}, accept {avg}\n"
+        )
 
-        if "image" not in data and update.message.photo:
-            data["image"] = update.message.photo[-1].file_id
-            await update.message.reply_text(
-                "💵 Enter item total (minimum ₹149):"
+    if admins:
+        msg += "\n👤 Today by admin\n"
+        for admin_id, accepted, completed, revenue, accept_seconds in admins:
+            avg = f"{accept_seconds / accepted:.0f}s" if accepted else "-"
+            msg += (
+                f"{admin_id}: {accepted} accepted, {completed} done, "
+                f"₹{revenue:.2f}, accept {avg}\n"
             )
-            return
 
-        if "item" not in data:
-            try:
-                item = float(text)
-                if item < 149:
-                    await update.message.reply_text(
-                        "❌ Minimum item total is ₹149"
-                    )
-                    return
-                data["item"] = item
-                await update.message.reply_text("🧾 Enter GST:")
-            except:
-                await update.message.reply_text("❌ Enter valid amount")
-            return
+    await update.message.reply_text(msg)
 
-        if "gst" not in data:
-            try:
-                gst = float(text)
-                data["gst"] = gst
-                data["final"] = calculate_final(
-                    data["item"], gst
-                )
-                kb = [[
-                    InlineKeyboardButton("💵 COD", callback_data="cod"),
-                    InlineKeyboardButton("💳 PREPAID", callback_data="prepaid")
-                ]]
-                await update.message.reply_text(
-                    f"💰 Total: ₹{data['final']}\nChoose payment:",
-                    reply_markup=InlineKeyboardMarkup(kb)
-                )
-            except:
-                await update.message.reply_text("❌ Enter valid GST")
-            return
 
-        if (
-            context.user_data.get("payment_mode") == "prepaid"
-            and "upi" not in data
-        ):
-            data["upi"] = text
-            await finalize_order(context, uid)
-            return
+@conversation.step("add_admin")
+async def add_admin_step(update, context, text):
+    try:
+        aid = int(text)
+        ADMINS[aid] = {
+            "role": "admin",
+            "status": "offline",
+            "login_time": 0
+        }
+        await update.message.reply_text(f"✅ Admin added: {aid}")
+    except ValueError:
+        await update.message.reply_text("❌ Invalid ID")
+    conversation.leave(context.user_data)
+
+
+@conversation.step("remove_admin")
+async def remove_admin_step(update, context, text):
+    try:
+        aid = int(text)
+    except ValueError:
+        aid = None
+    info = ADMINS.get(aid) if aid is not None else None
+    if info and info.get("role") == "admin":
+        del ADMINS[aid]
+        admin_pool.set_offline(aid)
+        await update.message.reply_text(f"✅ Admin removed: {aid}")
+    else:
+        await update.message.reply_text("❌ Invalid ID")
+    conversation.leave(context.user_data)
+
+
+# ---------- admin status update ----------
+async def admin_status_update(update, context, text):
+    uid = update.effective_user.id
+    info = ADMINS.get(uid)
+    info["status"] = "online" if "Online" in text else "offline"
+    ADMINS[uid] = info
+    if info["status"] == "online":
+        admin_pool.set_online(uid)
+        admission.kick()
+    else:
+        admin_pool.set_offline(uid)
+    await update.message.reply_text(
+        "✅ Status updated",
+        reply_markup=ReplyKeyboardRemove()
+    )
 
 
-# ================= FINALIZE ORDER =================
-async def finalize_order(context, uid):
-    global current_admin_turn
+conversation.button("admin", "Online ✅")(admin_status_update)
+conversation.button("admin", "Offline ❌")(admin_status_update)
 
-    data = context.user_data.get("data")
-    token = generate_token()
-    admins = get_online_admins()
 
-    if not admins:
-        await context.bot.send_message(
-            uid,
-            "❌ No admin online. Please try again later."
+# ---------- food order flow ----------
+@conversation.step("order_address")
+async def order_address_step(update, context, text):
+    if not text:
+        await update.message.reply_text("📍 Send delivery address link:")
+        return
+    context.user_data["data"]["address"] = text
+    conversation.enter(context.user_data, "order_image")
+    await update.message.reply_text("📸 Send food/card image")
+
+
+@conversation.step("order_image")
+async def order_image_step(update, context, text):
+    if not update.message.photo:
+        await update.message.reply_text("📸 Send food/card image")
+        return
+    context.user_data["data"]["image"] = update.message.photo[-1].file_id
+    conversation.enter(context.user_data, "order_item")
+    await update.message.reply_text(f"💵 Enter item total (minimum ₹{pricing.min_order:g}):")
+
+
+@conversation.step("order_item")
+async def order_item_step(update, context, text):
+    item = parse_amount(text)
+    if item is None:
+        await update.message.reply_text("❌ Enter valid amount")
+        return
+    if item < pricing.min_order:
+        await update.message.reply_text(
+            f"❌ Minimum item total is ₹{pricing.min_order:g}"
         )
-        context.user_data.clear()
         return
+    context.user_data["data"]["item"] = item
+    conversation.enter(context.user_data, "order_gst")
+    await update.message.reply_text("🧾 Enter GST:")
 
-    assigned_idx = current_admin_turn % len(admins)
-    assigned_admin = admins[assigned_idx]
-    current_admin_turn += 1
 
-    chat = await context.bot.get_chat(uid)
+@conversation.step("order_gst")
+async def order_gst_step(update, context, text):
+    gst = parse_amount(text)
+    if gst is None:
+        await update.message.reply_text("❌ Enter valid GST")
+        return
+    data = context.user_data["data"]
+    data["gst"] = gst
+    quote = pricing.quote(data["item"], gst, customer=update.effective_user.id)
+    data["final"] = quote.final
+    data["discount"] = quote.discount
+    conversation.enter(context.user_data, "order_payment")
+    kb = [[
+        InlineKeyboardButton("💵 COD", callback_data="cod"),
+        InlineKeyboardButton("💳 PREPAID", callback_data="prepaid")
+    ]]
+    await update.message.reply_text(
+        f"💰 Total: ₹{data['final']}\nChoose payment:",
+        reply_markup=InlineKeyboardMarkup(kb)
+    )
+
+
+@conversation.step("order_upi")
+async def order_upi_step(update, context, text):
+    if not text:
+        await update.message.reply_text("👛 Enter UPI ID:")
+        return
+    context.user_data["data"]["upi"] = text
+    await finalize_order(context, update.effective_user.id)
+
+
+# ================= FINALIZE ORDER =================
+@metrics.timed("finalize_order")
+async def finalize_order(context, uid):
+    data = context.user_data.get("data")
+    payment = context.user_data.get("payment_mode")
+    try:
+        data["name"] = await profiles.full_name(context.bot, uid)
+        # Nobody jumps the line while others are waiting for an admin
+        placed = len(admission) == 0 and await place_order(uid, data, payment)
+    except Exception:
+        # The form is kept, so the same tap or message tries again
+        outbox.send_message(
+            uid, "⚠️ Your order could not be placed just now. Please try again."
+        )
+        raise
+    context.user_data.clear()
+    if placed:
+        return
 
-    active_orders[token] = {
+    position = admission.offer(uid, data, payment)
+    if position is None:
+        metrics.admission_total.inc("full")
+        outbox.send_message(
+            uid,
+            "❌ All admins are busy and the waiting line is full. "
+            "Please try again later."
+        )
+        return
+    announce_position(
+        admission.waiting[uid], position, admission.eta(position, time.time())
+    )
+    admission.kick()
+
+
+async def place_order(uid, data, payment):
+    """Give a finished order its token and admin; False if nobody is free"""
+    sync_admin_pool()
+    assigned_admin = admin_pool.assign()
+    if assigned_admin is None:
+        return False
+
+    try:
+        token = await generate_token()
+    except Exception:
+        admin_pool.release(assigned_admin)   # Give back the slot it took
+        raise
+    order = {
         "status": "pending",
-        "admins": admins,
-        "index": assigned_idx,
         "assigned_admin": assigned_admin,
+        "round": 0,
+        "created_at": time.time(),
         "customer": {
             "id": uid,
-            "name": chat.full_name,
+            "name": data["name"],
             "address": data["address"],
             "image": data["image"],
             "final": data["final"],
-            "payment": context.user_data.get("payment_mode"),
+            "payment": payment,
             "upi": data.get("upi"),
         }
     }
+    order["deadline"] = escalation_deadline(order)
+    active_orders[token] = order
+    escalations.schedule(token, order["deadline"])
+    pricing.charge(uid, data.get("discount", 0))
+    journal.record(
+        "placed", token, customer=uid, final=data["final"],
+        payment=order["customer"]["payment"]
+    )
+    journal.record("assigned", token, admin=assigned_admin, round=0)
 
-    await context.bot.send_message(
+    outbox.send_message(
         uid,
-        f"✅ Order placed (Token: {token}). Waiting for admin acceptance..."
+        f"✅ Order placed (Token: {token}). Waiting for admin acceptance...\n"
+        f"Send /status any time to check on it."
     )
 
-    await send_to_admin(context, token)
-    context.user_data.clear()
-    asyncio.create_task(auto_forward_after_1min(context, token))
+    await send_to_admin(token)
+    return True
+
+
+# ---------- admission queue ----------
+async def admit(entry):
+    """Place the order at the head of the line, if an admin is free now"""
+    if not await place_order(entry.uid, entry.data, entry.payment):
+        return False
+    metrics.admission_wait_seconds.observe(time.time() - entry.since)
+    metrics.admission_total.inc("placed")
+    if entry.message_id:
+        outbox.send(
+            PRIORITY_CUSTOMER, "delete_message", entry.uid,
+            message_id=entry.message_id
+        )
+    return True
+
+
+def wait_text(eta):
+    if eta is None or len(admin_pool) == 0:
+        return ""
+    if eta < 90:
+        return " (about a minute)"
+    return f" (about {round(eta / 60)} min)"
+
+
+def announce_position(entry, position, eta):
+    """Send, or edit in place, a waiting customer's place in line"""
+    if len(admin_pool) == 0:
+        status = "No admin is online right now"
+    else:
+        status = "All admins are busy"
+    text = (
+        f"⏳ {status}. You are #{position} in line{wait_text(eta)}.\n"
+        f"Your order will be placed automatically."
+    )
+    if entry.shown is None:
+        entry.shown = text
+        outbox.send_message(entry.uid, text).add_done_callback(entry.sent)
+    elif text != entry.shown and entry.message_id:
+        entry.shown = text
+        outbox.edit(
+            "edit_message_text", entry.uid, entry.message_id,
+            priority=PRIORITY_CUSTOMER, text=text
+        )
 
 
-async def auto_forward_after_1min(context, token):
-    await asyncio.sleep(60)
-    order = active_orders.get(token)
+def admission_failed(entry):
+    """Placing a waiting order raised; it leaves the line, so say so"""
+    metrics.admission_total.inc("failed")
+    outbox.send_message(
+        entry.uid,
+        "⚠️ Your order could not be placed. Send /start to order again."
+    )
 
-    if order and order["status"] == "pending":
-        order["index"] = (order["index"] + 1) % len(order["admins"])
-        order["assigned_admin"] = order["admins"][order["index"]]
-        await send_to_admin(context, token)
 
+admission = AdmissionQueue(admit, announce_position, admission_failed)  # Orders waiting for an admin
 
-async def send_to_admin(context, token):
-    order = active_orders.get(token)
-    if not order:
+
+# ================= ORDER STATUS =================
+def order_status(token, order):
+    admin_online = admin_pool.is_online(order["assigned_admin"])
+    head = f"🧾 Token {token} · ₹{order['customer']['final']}"
+    if order["status"] == "accepted":
+        return (
+            f"{head}\n✅ Accepted and being prepared. "
+            f"Message here to chat with your admin"
+            + ("." if admin_online else " (they are offline right now).")
+        )
+    if not admin_online:
+        return f"{head}\n⌛ Waiting for an admin; it will move to one who is online."
+    left = max(0, round((order.get("deadline", 0) - time.time()) / 60))
+    if order["round"] and left:
+        return f"{head}\n⌛ With another admin now, who has {left} min to accept."
+    if left:
+        return f"{head}\n⌛ Waiting for the admin to accept ({left} min left)."
+    return f"{head}\n⌛ Waiting for the admin to accept."
+
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Customers check their orders here instead of asking in the chat"""
+    uid = update.effective_user.id
+    sync_admin_pool()
+    lines = []
+    position = admission.position(uid)
+    if position is not None:
+        eta = admission.eta(position, time.time())
+        lines.append(
+            f"⏳ Your order is #{position} in line for a free admin"
+            f"{wait_text(eta)}."
+        )
+    for token, order in await active_orders.fetch_customer(uid):
+        lines.append(order_status(token, order))
+    if not lines:
+        lines.append("You have no open orders. Send /start to place one.")
+    await update.message.reply_text("\n\n".join(lines))
+
+
+async def escalate_order(token):
+    """Deadline passed without an accept: hand the order to the next admin"""
+    order = await active_orders.fetch(token)
+    if not order or order["status"] != "pending":
+        return
+    # Another worker may have taken it, or already escalated this round
+    if await state.claim_owner(f"accept_{token}") is not None:
+        return
+    if not await state.claim(f"escalate_{token}_{order['round']}", WORKER_ID):
+        return
+
+    if order["round"] + 1 >= ESCALATION_MAX_ROUNDS:
+        # Past this, moving it on again is just more noise for the admins
+        order.pop("deadline", None)
+        active_orders.save(token)
+        outbox.send_message(
+            MAIN_ADMIN_ID,
+            f"⚠️ Token {token} is still not accepted after "
+            f"{order['round'] + 1} rounds; it stays with admin "
+            f"{order['assigned_admin']}."
+        )
+        return
+    if not reassign(order):
+        # Nobody else is free: leave it with the same admin, no re-send
+        order["deadline"] = escalation_deadline(order)
+        active_orders.save(token)
+        escalations.schedule(token, order["deadline"])
         return
 
+    digest.resolve(token, "⏩ Moved on")
+    order["round"] += 1
+    order["deadline"] = escalation_deadline(order)
+    active_orders.save(token)
+    escalations.schedule(token, order["deadline"])
+    metrics.escalations_total.inc("timeout")
+    journal.record("escalated", token, round=order["round"])
+    journal.record(
+        "assigned", token, admin=order["assigned_admin"], round=order["round"]
+    )
+    await send_to_admin(token)
+
+
+escalations = DeadlineScheduler(escalate_order)  # Token -> escalation deadline
+
+
+def order_details(token, order):
     cust = order["customer"]
-    caption = (
-        f"📦 NEW ORDER\n"
+    details = (
         f"👤 {cust['name']}\n"
         f"🎟 Token: {token}\n"
         f"📍 {cust['address']}\n"
         f"💰 ₹{cust['final']}\n"
         f"💳 {cust['payment'].upper()}"
     )
-
     if cust.get("upi"):
-        caption += f"\n👛 UPI: {cust['upi']}"
+        details += f"\n👛 UPI: {cust['upi']}"
+    return details
+
+
+@metrics.timed("send_to_admin")
+async def send_to_admin(token):
+    order = active_orders.get(token)
+    if not order:
+        return
+
+    cust = order["customer"]
+    caption = "📦 NEW ORDER\n" + order_details(token, order)
+
+    if ADMIN_DIGEST:
+        summary = (
+            f"🎟 {token} · ₹{cust['final']} · "
+            f"{cust['payment'].upper()} · {cust['name']}"
+        )
+        digest.add(order["assigned_admin"], token, cust["image"], caption, summary)
+        return
 
     kb = [
         [InlineKeyboardButton(
@@ -407,15 +838,17 @@ async def send_to_admin(context, token):
         )],
     ]
 
-    await context.bot.send_photo(
+    outbox.send_photo(
         order["assigned_admin"],
         cust["image"],
+        priority=PRIORITY_ADMIN,
         caption=caption,
         reply_markup=InlineKeyboardMarkup(kb)
     )
 
 
 # ================= ADMIN CALLBACKS =================
+@metrics.timed("admin_callbacks")
 async def admin_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
@@ -424,31 +857,53 @@ async def admin_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     action = parts[0]
     token = int(parts[1])
 
-    order = active_orders.get(token)
+    order = await active_orders.fetch(token)
     if not order:
-        await q.message.edit_caption(
-            "❌ Order expired or completed"
-        )
+        if token in digest:
+            digest.resolve(token, "❌ Expired")
+        else:
+            await q.message.edit_caption(
+                "❌ Order expired or completed"
+            )
         return
 
-    if q.from_user.id != order["assigned_admin"] and action != "reject":
+    if q.from_user.id != order["assigned_admin"]:
         await q.message.reply_text(
             "❌ This order is not assigned to you."
         )
         return
 
     if action == "accept":
+        if not await state.claim(f"accept_{token}", q.from_user.id):
+            await q.message.reply_text(
+                f"❌ Token {token} was already accepted."
+            )
+            return
         order["status"] = "accepted"
+        order["accepted_at"] = time.time()
+        active_orders.save(token)
+        escalations.cancel(token)
+        digest.resolve(token, "✅ Accepted")
+        if "created_at" in order:
+            metrics.accept_seconds.observe(
+                order["accepted_at"] - order["created_at"]
+            )
+        metrics.escalations_per_order.observe(order["round"])
+        admission.accepted()
         admin_id = q.from_user.id
         cust_id = order["customer"]["id"]
 
         CHAT_SESSIONS[admin_id] = cust_id
         CHAT_SESSIONS[cust_id] = admin_id
         USER_TOKENS[cust_id] = token
+        sessions.touch("chat", admin_id)
+        sessions.touch("chat", cust_id)
+        journal.record("accepted", token, admin=admin_id, customer=cust_id)
 
-        await context.bot.send_message(
+        outbox.send_message(
             cust_id,
-            "✅ Your order has been accepted. You can now chat with the admin."
+            "✅ Your order has been accepted. You can now chat with the admin.\n"
+            "Send /status to see where it stands."
         )
 
         kb = [
@@ -474,31 +929,455 @@ async def admin_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
         CHAT_SESSIONS.pop(admin_id, None)
         CHAT_SESSIONS.pop(cust_id, None)
         USER_TOKENS.pop(cust_id, None)
+        journal.record("chat_closed", token, admin=admin_id, customer=cust_id)
+        transcripts.finish(token)
 
         await q.message.reply_text("📴 Chat closed.")
-        await context.bot.send_message(
+        outbox.send_message(
             cust_id,
             "📴 Admin has closed the chat session."
         )
 
     elif action == "reject":
-        order["index"] = (order["index"] + 1) % len(order["admins"])
-        order["assigned_admin"] = order["admins"][order["index"]]
-        await send_to_admin(context, token)
-        await q.message.delete()
+        # A tap on an old photo or board row must not move an accepted order
+        if (order["status"] != "pending"
+                or await state.claim_owner(f"accept_{token}") is not None):
+            await q.message.reply_text(
+                f"❌ Token {token} was already accepted."
+            )
+            return
+        if not await state.claim(f"reject_{token}_{order['round']}", q.from_user.id):
+            return
+        if not reassign(order):
+            await q.message.reply_text(
+                f"⚠️ No other admin is free right now. Token {token} stays "
+                f"with you and moves on once someone is."
+            )
+            return
+        on_board = token in digest
+        digest.resolve(token, "❌ Rejected")
+        order["round"] += 1
+        order["deadline"] = escalation_deadline(order)
+        active_orders.save(token)
+        escalations.schedule(token, order["deadline"])
+        metrics.escalations_total.inc("reject")
+        journal.record(
+            "rejected", token, admin=q.from_user.id, round=order["round"]
+        )
+        journal.record(
+            "assigned", token, admin=order["assigned_admin"], round=order["round"]
+        )
+        await send_to_admin(token)
+        if not on_board:
+            await q.message.delete()
 
     elif action == "complete":
         tracking_wait[q.from_user.id] = token
+        sessions.touch("tracking", q.from_user.id)
         await q.message.reply_text(
             "🚚 Send tracking link to complete order and send thank you note:"
         )
 
 
-# ================= MAIN =================
-if __name__ == "__main__":
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+# ================= EXPORT =================
+def write_export(start, end, fmt):
+    """Stream the journal into a temp file; returns its path"""
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        for chunk in export(start, end, fmt):
+            f.write(chunk)
+    return path
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id != MAIN_ADMIN_ID:
+        return
+
+    args = context.args
+    fmt = args[2] if len(args) > 2 else "csv"
+    if len(args) < 2 or fmt not in ("csv", "jsonl"):
+        await update.message.reply_text(
+            "Usage: /export YYYY-MM-DD YYYY-MM-DD [csv|jsonl]"
+        )
+        return
+    try:
+        start, end = day_range(args[0], args[1])
+    except ValueError:
+        await update.message.reply_text("❌ Dates must look like 2024-01-31")
+        return
+
+    path = await asyncio.to_thread(write_export, start, end, fmt)
+    try:
+        with open(path, "rb") as f:
+            await update.message.reply_document(
+                f, filename=f"orders_{args[0]}_{args[1]}.{fmt}"
+            )
+    finally:
+        os.remove(path)
+
+
+async def transcript_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/transcript TOKEN: the order's admin-customer chat as a text file"""
+    if update.effective_user.id != MAIN_ADMIN_ID:
+        return
+
+    args = context.args
+    if len(args) != 1 or not args[0].isdecimal():
+        await update.message.reply_text("Usage: /transcript TOKEN")
+        return
+    token = int(args[0])
+    lines = await transcripts.read(token)
+    if not lines:
+        await update.message.reply_text(f"❌ No chat recorded for token {token}")
+        return
+    await update.message.reply_document(
+        render(token, lines).encode(), filename=f"chat_{token}.txt"
+    )
+
+
+# ================= ORDER SEARCH =================
+INLINE_PAGE = 20   # Results per inline answer; Telegram allows up to 50
+
+
+@metrics.timed("inline_search")
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """@bot <token, name, address or UPI>: the main admin searches every
+    live and recent order, other admins the ones assigned to them"""
+    q = update.inline_query
+    role = role_of(q.from_user.id)
+    if role == "customer":
+        await q.answer([], cache_time=300, is_personal=True)
+        return
+
+    offset = int(q.offset) if q.offset.isdecimal() else 0
+    hits = active_orders.search.search(
+        q.query, limit=offset + INLINE_PAGE + 1,
+        admin=None if role == "main" else q.from_user.id,
+    )
+    results = []
+    for token in hits[offset:offset + INLINE_PAGE]:
+        order = active_orders.search.get(token)
+        cust = order["customer"]
+        results.append(InlineQueryResultArticle(
+            id=str(token),
+            title=f"🎟 {token} · ₹{cust['final']} · {order['status']}",
+            description=f"{cust['name']} · {cust['address']}",
+            input_message_content=InputTextMessageContent(
+                f"📦 {order['status'].upper()}\n" + order_details(token, order)
+            ),
+        ))
+    more = len(hits) > offset + INLINE_PAGE
+    await q.answer(
+        results, cache_time=0, is_personal=True,
+        next_offset=str(offset + INLINE_PAGE) if more else "",
+    )
+
+
+# ================= BULK QUOTE =================
+async def bulk_quote_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admins send a CSV of item,gst rows and get every final back"""
+    uid = update.effective_user.id
+    # Just a file: a customer's, or an admin's to the customer they chat with
+    if role_of(uid) == "customer" or uid in CHAT_SESSIONS:
+        await messages(update, context)
+        return
+    doc = update.message.document
+    if doc.file_size and doc.file_size > 1024 * 1024:
+        await update.message.reply_text("❌ CSV too large (max 1 MB)")
+        return
+
+    file = await doc.get_file()
+    raw = await file.download_as_bytearray()
+    result, rows = bulk_quote(raw.decode("utf-8-sig", errors="replace"), pricing)
+    await update.message.reply_document(
+        result.encode(),
+        filename=f"quotes_{doc.file_name or 'prices.csv'}",
+        caption=f"💰 {rows} rows quoted"
+    )
+
+
+# ================= SESSIONS =================
+@sessions.sweep("flows")
+async def sweep_flows(app, now):
+    """Abandoned half-finished flows, and per-user data nobody is using"""
+    evicted = 0
+    for uid, data in list(app.user_data.items()):
+        if data.get("state"):
+            if not conversation.expired(data):
+                continue
+            outbox.send_message(
+                uid, "⌛ Session expired. Send /start to begin again."
+            )
+        elif sessions.idle("user", uid, now) < USER_IDLE_TTL:
+            continue
+        app.drop_user_data(uid)
+        sessions.forget("user", uid)
+        evicted += 1
+    for uid in sessions.idle_keys("user", USER_IDLE_TTL, now):
+        if uid not in app.user_data:
+            sessions.forget("user", uid)
+    return evicted
+
+
+@sessions.sweep("tracking")
+async def sweep_tracking(app, now):
+    evicted = 0
+    for admin_id in list(tracking_wait):
+        token = tracking_wait.get(admin_id)
+        if token in active_orders and (
+            sessions.idle("tracking", admin_id, now) < TRACKING_TTL
+        ):
+            continue
+        tracking_wait.pop(admin_id, None)
+        sessions.forget("tracking", admin_id)
+        outbox.send_message(
+            admin_id,
+            f"⌛ Tracking link request for Token {token} expired. "
+            f"Tap Complete Order again when ready."
+        )
+        evicted += 1
+    return evicted
+
+
+@sessions.sweep("chats")
+async def sweep_chats(app, now):
+    evicted = 0
+    for uid in list(CHAT_SESSIONS):
+        peer = CHAT_SESSIONS.get(uid)
+        if peer is None or sessions.idle("chat", uid, now) < CHAT_TTL:
+            continue
+        CHAT_SESSIONS.pop(uid, None)
+        USER_TOKENS.pop(uid, None)
+        sessions.forget("chat", uid)
+        outbox.send_message(uid, "📴 Chat session closed after inactivity.")
+        # An admin's entry only points at their most recent customer
+        if CHAT_SESSIONS.get(peer) == uid:
+            CHAT_SESSIONS.pop(peer, None)
+            USER_TOKENS.pop(peer, None)
+            sessions.forget("chat", peer)
+            outbox.send_message(peer, "📴 Chat session closed after inactivity.")
+        evicted += 1
+    # Tokens and relay headers left behind by chats that no longer exist
+    for cust_id in list(USER_TOKENS):
+        if cust_id not in CHAT_SESSIONS:
+            USER_TOKENS.pop(cust_id, None)
+            evicted += 1
+    for uid in list(relay.headed):
+        if uid not in CHAT_SESSIONS:
+            relay.forget(uid)
+    # Chats that ended without a close here, e.g. on another worker
+    transcripts.finish_idle(now, CHAT_TTL)
+    return evicted
+
+
+@sessions.sweep("orders")
+async def sweep_orders(app, now):
+    """Orders nobody ever completed"""
+    evicted = 0
+    for token, order in list(active_orders.items()):
+        if "created_at" in order:
+            age = now - order["created_at"]
+        else:
+            age = sessions.idle("order", token, now)
+        if age < ORDER_TTL:
+            continue
+        if await active_orders.refresh(token) is None:
+            # Finished on another worker since this one cached it
+            escalations.cancel(token)
+            admin_pool.release(order["assigned_admin"])
+            continue
+        escalations.cancel(token)
+        digest.resolve(token, "⌛ Expired")
+        admin_pool.release(order["assigned_admin"])
+        admission.kick()
+        active_orders.complete(token, status="expired")
+        sessions.forget("order", token)
+        cust_id = order["customer"]["id"]
+        journal.record(
+            "expired", token, admin=order["assigned_admin"], customer=cust_id
+        )
+        outbox.send_message(
+            cust_id, f"⌛ Order {token} expired. Send /start to order again."
+        )
+        outbox.send_message(
+            order["assigned_admin"], f"⌛ Token {token} expired unfinished."
+        )
+        evicted += 1
+    return evicted
+
+
+@sessions.sweep("admission")
+async def sweep_admission(app, now):
+    """Orders that waited too long for a free admin"""
+    expired = admission.expire(now)
+    for entry in expired:
+        metrics.admission_total.inc("expired")
+        outbox.send_message(
+            entry.uid,
+            "⌛ No admin became free in time, so your order was not placed. "
+            "Send /start to try again."
+        )
+    return len(expired)
+
+
+sessions.measure("user_data", lambda: len(sessions.app.user_data))
+sessions.measure("tracking", lambda: len(tracking_wait))
+sessions.measure("chats", lambda: len(CHAT_SESSIONS))
+sessions.measure("user_tokens", lambda: len(USER_TOKENS))
+sessions.measure("relay_headers", lambda: len(relay))
+sessions.measure("transcripts", lambda: len(transcripts))
+sessions.measure("orders", lambda: len(active_orders))
+sessions.measure("profiles", lambda: len(profiles.entries))
+sessions.measure("admission", lambda: len(admission))
+metrics.Gauge(
+    "bot_sessions", "Entries held per session structure",
+    lambda: sessions.usage() if sessions.app else {}, "kind"
+)
 
+
+# ================= LIFECYCLE =================
+def order_counts():
+    counts = {"pending": 0, "accepted": 0}
+    for order in active_orders.values():
+        counts[order["status"]] = counts.get(order["status"], 0) + 1
+    return counts
+
+
+metrics.Gauge("bot_orders", "Live orders by status", order_counts, "status")
+metrics.Gauge("bot_outbox_depth", "Calls waiting in the outbox", outbox.depth)
+metrics.Gauge(
+    "bot_order_write_queue_depth", "Order snapshots waiting to be written",
+    lambda: len(active_orders.writer)
+)
+metrics.Gauge(
+    "bot_escalations_scheduled", "Orders with a pending escalation deadline",
+    lambda: len(escalations)
+)
+metrics.Gauge(
+    "admission_queue_depth", "Orders waiting in line for a free admin",
+    lambda: len(admission)
+)
+metrics.Gauge(
+    "bot_rate_limited_users", "Users with a rate-limit bucket", lambda: len(limiter)
+)
+metrics.Gauge(
+    "bot_profile_cache", "Profile cache size and lookups",
+    lambda: {k: v for k, v in profiles.stats().items() if k != "hit_rate"},
+    "stat"
+)
+update_queue_depth = metrics.Gauge(
+    "bot_update_queue_depth", "Updates waiting for a handler"
+)
+metrics_server = None
+
+
+async def post_init(app):
+    global metrics_server
+    startup["connect"] = time.perf_counter()   # initialize() ran getMe
+    await active_orders.open()
+    await journal.open()
+    await transcripts.open()
+    outbox.start(app.bot)
+    state.start()
+
+    update_queue_depth.read = app.update_queue.qsize
+    if METRICS_PORT:
+        try:
+            metrics_server = await metrics.serve(METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint not started: {e}")
+
+    # Pick up loads and escalation deadlines of orders that survived a restart
+    for token, order in active_orders.items():
+        admin_pool.add_load(order["assigned_admin"])
+        if order["status"] == "pending" and "deadline" in order:
+            escalations.schedule(token, order["deadline"])
+    escalations.start()
+    admission.start()
+    sessions.start(app)
+    if recorder:
+        recorder.open(
+            dict(ADMINS),
+            keep_texts=[text for _, text in conversation.buttons],
+            id_states=("add_admin", "remove_admin"),
+        )
+        journal.listeners.append(recorder.observe)
+
+    startup["restore"] = time.perf_counter()
+    report_startup()
+
+
+def report_startup():
+    last = STARTED
+    phases = []
+    for phase, at in startup.items():
+        phases.append(f"{phase} {(at - last) * 1000:.0f} ms")
+        last = at
+    print(
+        f"⏱ Ready in {(last - STARTED) * 1000:.0f} ms "
+        f"({', '.join(phases)}, {len(active_orders)} live orders)"
+    )
+
+
+async def post_shutdown(app):
+    if metrics_server is not None:
+        metrics_server.close()
+    await sessions.stop()
+    await digest.stop()
+    await relay.stop()
+    if recorder:
+        await recorder.close()
+    await escalations.stop()
+    await admission.stop()
+    for entry in admission.waiting.values():
+        outbox.send_message(
+            entry.uid,
+            "⚠️ The bot is restarting and your order was not placed. "
+            "Send /start to order again."
+        )
+    await outbox.stop()
+    await state.stop()
+    await active_orders.close()
+    await journal.close()
+    await transcripts.close()
+
+
+# ================= MAIN =================
+def build_app():
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(transport.send_request())
+        .get_updates_request(transport.get_updates_request())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if BOT_API_URL:
+        builder = builder.base_url(BOT_API_URL).base_file_url(
+            BOT_API_URL.replace("/bot", "/file/bot")
+        )
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(
+            PerChatUpdateProcessor(CONCURRENT_UPDATES)
+        )
+    if UPDATE_MODE == "webhook":
+        # Bounded so the webhook server can push back when we fall behind
+        builder = builder.update_queue(
+            asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+        ).updater(None)
+    app = builder.build()
+
+    if recorder:
+        app.add_handler(TypeHandler(Update, recorder.record), group=-3)
+    # Floods stop here, before they cost a profile write or a handler
+    app.add_handler(TypeHandler(Update, rate_limit), group=-2)
+    # Runs before every other handler to keep profiles warm
+    app.add_handler(TypeHandler(Update, remember_profile), group=-1)
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("export", export_command))
+    app.add_handler(CommandHandler("transcript", transcript_command))
+    app.add_handler(CommandHandler("status", status_command))
+    app.add_handler(InlineQueryHandler(inline_search))
     app.add_handler(
         CallbackQueryHandler(
             buttons,
@@ -512,8 +1391,25 @@ if __name__ == "__main__":
         )
     )
     app.add_handler(
-        MessageHandler(filters.TEXT | filters.PHOTO, messages)
+        MessageHandler(filters.Document.FileExtension("csv"), bulk_quote_upload)
     )
+    # Every kind of message: chats relay whatever is sent
+    app.add_handler(
+        MessageHandler(
+            filters.UpdateType.MESSAGE & ~filters.StatusUpdate.ALL, messages
+        )
+    )
+
+    startup["build"] = time.perf_counter()
+    return app
+
+
+if __name__ == "__main__":
+    app = build_app()
 
     print("🚀 Bot running with Chat feature...")
-    app.run_polling()
+    if UPDATE_MODE == "webhook":
+        from webhook import run_webhook
+        run_webhook(app)
+    else:
+        app.run_polling(timeout=POLL_TIMEOUT)
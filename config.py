@@ -1,12 +1,152 @@
 import os
+import socket
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 MAIN_ADMIN_ID = int(os.getenv("MAIN_ADMIN_ID"))
 
-MIN_ORDER = 149
-DISCOUNT = 0
+MIN_ORDER = float(os.getenv("MIN_ORDER", "149"))
+DISCOUNT = float(os.getenv("DISCOUNT", "0.5"))   # Fraction taken off the item total
 BOT_NAME = "Latest Food Bot"
 
+# ================= PRICING =================
+# Higher discount from an item total up, e.g. "500:0.55,1000:0.6"
+PRICE_TIERS = os.getenv("PRICE_TIERS", "")
+# Extra discount during a local time window, e.g. "22:00-02:00:0.05"
+PROMOS = os.getenv("PROMOS", "")
+# Most discount (₹) one customer gets per day; 0 = no cap
+DISCOUNT_DAILY_CAP = float(os.getenv("DISCOUNT_DAILY_CAP", "0"))
+
+# ================= STORAGE =================
+DB_PATH = os.getenv("DB_PATH", "orders.db")
+ORDER_FLUSH_INTERVAL = float(os.getenv("ORDER_FLUSH_INTERVAL", "0.05"))
+ORDER_FLUSH_BATCH = int(os.getenv("ORDER_FLUSH_BATCH", "500"))
+ORDER_RETRY_INTERVAL = float(os.getenv("ORDER_RETRY_INTERVAL", "1"))  # Seconds before a failed batch is retried
+TOKEN_LEASE_BLOCK = int(os.getenv("TOKEN_LEASE_BLOCK", "50"))
+
+# ================= UPDATES =================
+# Point at a local Bot API server (or loadtest.py's stand-in) instead of
+# api.telegram.org, e.g. "http://127.0.0.1:8081/bot"
+BOT_API_URL = os.getenv("BOT_API_URL", "")
+# "polling" (default) or "webhook"
+UPDATE_MODE = os.getenv("UPDATE_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")   # Public base URL; empty = don't register
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# Updates handled at once; each user's and chat's updates still run in
+# order. 1 = fully sequential.
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+
+# ================= INBOUND LIMITS =================
+# Updates per user, by role: "role:per_sec:burst,..."; roles left out
+# (the main admin by default) are not limited
+RATE_LIMITS = os.getenv("RATE_LIMITS", "customer:1:20,admin:5:30")
+RATE_LIMIT_USERS = int(os.getenv("RATE_LIMIT_USERS", "10000"))  # Buckets kept, LRU
+RATE_LIMIT_WARN = float(os.getenv("RATE_LIMIT_WARN", "60"))     # Seconds between "slow down" notices
+
+# ================= HTTP =================
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))   # Connections for sends
+HTTP_VERSION = os.getenv("HTTP_VERSION", "1.1")           # "2" needs the h2 package
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "5"))
+HTTP_MEDIA_WRITE_TIMEOUT = float(os.getenv("HTTP_MEDIA_WRITE_TIMEOUT", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "3"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))  # Idle seconds before a connection is dropped
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "30"))        # getUpdates long-poll seconds
+
+# ================= OUTBOUND LIMITS =================
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "30"))   # calls/sec
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))        # calls/sec per chat
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "3"))
+OUTBOX_RETRIES = int(os.getenv("OUTBOX_RETRIES", "3"))
+
+# ================= SHARED STATE =================
+# "memory" for a single worker, "sqlite" to share state between workers
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "state.db")
+CLAIM_TTL = int(os.getenv("CLAIM_TTL", "86400"))
+# Seconds between checks for other workers' changes to mirrored namespaces
+STATE_MIRROR_INTERVAL = float(os.getenv("STATE_MIRROR_INTERVAL", "0.2"))
+STATE_RETRY_INTERVAL = float(os.getenv("STATE_RETRY_INTERVAL", "1"))  # After a failed write
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# Flow state (context.user_data) and admin loads live in each worker, so
+# every user's updates must reach the same one. Behind a plain load
+# balancer, list every worker's internal webhook base URL in the same
+# order on all of them, plus this worker's position; an update for
+# someone else's user is forwarded there (user ID % number of workers).
+WORKER_PEERS = [u for u in os.getenv("WORKER_PEERS", "").split(",") if u]
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+
+# ================= PROFILES =================
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_TTL = float(os.getenv("PROFILE_TTL", "86400"))
+
+# ================= CONVERSATION =================
+# Seconds a half-finished flow (order, price check, admin edit) stays alive
+STATE_TIMEOUT = float(os.getenv("STATE_TIMEOUT", "1800"))
+
+# ================= ADMIN DIGEST =================
+# Batch new orders per admin into albums with one keyboard ("1" = on)
+ADMIN_DIGEST = os.getenv("ADMIN_DIGEST", "0") == "1"
+DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "2"))   # Seconds to collect a batch
+DIGEST_SIZE = int(os.getenv("DIGEST_SIZE", "10"))        # Orders per album, at most 10
+
+# ================= CHAT RELAY =================
+# Seconds to wait for the rest of an album before relaying it as one
+RELAY_ALBUM_WINDOW = float(os.getenv("RELAY_ALBUM_WINDOW", "1"))
+
+# ================= SESSIONS =================
+# One sweeper expires everything below; all values are seconds
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+USER_IDLE_TTL = float(os.getenv("USER_IDLE_TTL", "900"))       # Empty per-user data
+TRACKING_TTL = float(os.getenv("TRACKING_TTL", "21600"))       # Waiting for a tracking link
+CHAT_TTL = float(os.getenv("CHAT_TTL", "86400"))               # Chat with no messages
+ORDER_TTL = float(os.getenv("ORDER_TTL", "259200"))            # Order never completed
+
+# ================= ESCALATION =================
+# Seconds an admin has per round before the order moves on; the last
+# value repeats for every further round.
+ESCALATION_TIMEOUTS = [
+    float(t) for t in os.getenv("ESCALATION_TIMEOUTS", "60,60,120").split(",")
+]
+# Rounds after which an unaccepted order stays put and the main admin is told
+ESCALATION_MAX_ROUNDS = int(os.getenv("ESCALATION_MAX_ROUNDS", "10"))
+
+# ================= ADMISSION =================
+# Orders wait in line when no admin is free instead of being turned away
+ADMIN_CAPACITY = int(os.getenv("ADMIN_CAPACITY", "0"))            # Open orders per admin; 0 = no limit
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "200"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "1800"))  # Seconds before giving up
+ADMISSION_WINDOW = float(os.getenv("ADMISSION_WINDOW", "900"))    # Accept rate window for ETAs
+ADMISSION_REFRESH = float(os.getenv("ADMISSION_REFRESH", "15"))   # Seconds between position updates
+
+# ================= SEARCH =================
+# Finished orders admins can still find with inline search
+SEARCH_RECENT = int(os.getenv("SEARCH_RECENT", "5000"))
+
+# ================= JOURNAL =================
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "journal")
+JOURNAL_SEGMENT_BYTES = int(os.getenv("JOURNAL_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+
+# ================= TRANSCRIPTS =================
+# Compressed admin-customer chats per order, for /transcript
+TRANSCRIPT_DIR = os.getenv("TRANSCRIPT_DIR", "transcripts")
+TRANSCRIPT_SEGMENT_BYTES = int(os.getenv("TRANSCRIPT_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+
+# ================= RECORDING =================
+# Capture anonymised updates for replay.py, e.g.
+# "recordings/updates-%Y%m%dT%H%M%S.jsonl.gz"; empty = off
+RECORD_PATH = os.getenv("RECORD_PATH", "")
+RECORD_SALT = os.getenv("RECORD_SALT", "")   # Key for pseudonymous IDs; empty = random per recording
+
+# ================= METRICS =================
+# Prometheus text on http://METRICS_HOST:METRICS_PORT/metrics; 0 = off
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
 
 
 
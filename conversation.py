@@ -0,0 +1,79 @@
+# conversation.py
+import time
+
+
+class Conversation:
+    """Table-driven conversation flow.
+
+    Each user sits in one named state (kept in context.user_data) and
+    every incoming message is dispatched with a single dict lookup,
+    however many states are registered. Fixed keyboard buttons are
+    looked up by (role, text) before the state, so a button always works
+    no matter where the user is in a flow.
+    """
+
+    def __init__(self, default_timeout=None):
+        self.steps = {}           # State -> async handler(update, context, text)
+        self.timeouts = {}        # State -> seconds, None = never expires
+        self.buttons = {}         # (role, text) -> async handler(update, context, text)
+        self.default_timeout = default_timeout
+
+    def step(self, state, timeout=...):
+        def register(handler):
+            self.steps[state] = handler
+            self.timeouts[state] = (
+                self.default_timeout if timeout is ... else timeout
+            )
+            return handler
+        return register
+
+    def button(self, role, text):
+        def register(handler):
+            self.buttons[(role, text)] = handler
+            return handler
+        return register
+
+    # ---------- per-user state ----------
+    @staticmethod
+    def enter(user_data, state):
+        user_data["state"] = state
+        user_data["state_at"] = time.monotonic()
+
+    @staticmethod
+    def leave(user_data):
+        user_data.clear()
+
+    def expired(self, user_data):
+        """True if the user's state has outlived its timeout"""
+        state = user_data.get("state")
+        timeout = self.timeouts.get(state)
+        return bool(
+            timeout and time.monotonic() - user_data["state_at"] > timeout
+        )
+
+    def current(self, user_data):
+        """(state, expired) for this user; expired states are cleared"""
+        state = user_data.get("state")
+        if state is None:
+            return None, False
+        if self.expired(user_data):
+            user_data.clear()
+            return None, True
+        return state, False
+
+    # ---------- dispatch ----------
+    def route(self, role, text, user_data, fallback):
+        """Handler for this message.
+
+        fallback() is only called when the user's own state does not take
+        text input (or there is none) and must return a state name, e.g.
+        from the chat tunnel. Returns (handler, expired).
+        """
+        handler = self.buttons.get((role, text))
+        if handler:
+            return handler, False
+        state, expired = self.current(user_data)
+        handler = self.steps.get(state)
+        if handler is None:
+            handler = self.steps.get(fallback())
+        return handler, expired
@@ -1,32 +1,158 @@
 # database.py
 import sqlite3
+import time
 
-conn = sqlite3.connect("orders.db", check_same_thread=False)
-cursor = conn.cursor()
-
-# Orders table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS orders (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    user_name TEXT,
-    address TEXT,
-    food_image TEXT,
-    price REAL,
-    final_price REAL,
-    token INTEGER,
-    status TEXT
-)
-""")
-
-# Token counter table
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS token_counter (
-    id INTEGER PRIMARY KEY,
-    last_token INTEGER
-)
-""")
-
-# Initialize token
-cursor.execute("INSERT OR IGNORE INTO token_counter (id, last_token) VALUES (1, 0)")
-conn.commit()
+from config import DB_PATH
+
+# Columns the bot writes. Older databases were created with a different
+# layout, so anything missing here is added on startup.
+ORDER_COLUMNS = {
+    "user_id": "INTEGER",
+    "user_name": "TEXT",
+    "address": "TEXT",
+    "food_image": "TEXT",
+    "price": "REAL",
+    "final_price": "REAL",
+    "token": "INTEGER",
+    "status": "TEXT",
+    "payment": "TEXT",
+    "upi": "TEXT",
+    "assigned_admin": "INTEGER",
+    "created_at": "REAL",
+    "accepted_at": "REAL",
+    "completed_at": "REAL",
+    "data": "TEXT",
+}
+
+
+def connect(path=DB_PATH):
+    """Open a WAL-mode connection and make sure the schema exists"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    init_db(conn)
+    return conn
+
+
+def init_db(conn):
+    cursor = conn.cursor()
+
+    # Orders table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        user_name TEXT,
+        address TEXT,
+        food_image TEXT,
+        price REAL,
+        final_price REAL,
+        token INTEGER,
+        status TEXT
+    )
+    """)
+    add_missing_columns(conn, "orders", ORDER_COLUMNS)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_admin "
+        "ON orders (status, assigned_admin)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_created "
+        "ON orders (user_id, created_at)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_token ON orders (token)")
+
+    # Reporting rollups, kept current by the order writer
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        day TEXT PRIMARY KEY,
+        orders INTEGER DEFAULT 0,
+        accepted INTEGER DEFAULT 0,
+        completed INTEGER DEFAULT 0,
+        revenue REAL DEFAULT 0,
+        accept_seconds REAL DEFAULT 0
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS admin_rollup (
+        day TEXT,
+        admin_id INTEGER,
+        accepted INTEGER DEFAULT 0,
+        completed INTEGER DEFAULT 0,
+        revenue REAL DEFAULT 0,
+        accept_seconds REAL DEFAULT 0,
+        PRIMARY KEY (day, admin_id)
+    )
+    """)
+
+    # Token counter table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS token_counter (
+        id INTEGER PRIMARY KEY,
+        last_token INTEGER
+    )
+    """)
+
+    # Initialize token
+    cursor.execute("INSERT OR IGNORE INTO token_counter (id, last_token) VALUES (1, 0)")
+
+    # Never hand out a token that is already on an order row
+    cursor.execute("""
+    UPDATE token_counter
+    SET last_token = (SELECT MAX(token) FROM orders)
+    WHERE id=1 AND last_token < (SELECT COALESCE(MAX(token), 0) FROM orders)
+    """)
+    conn.commit()
+
+
+def add_missing_columns(conn, table, columns):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, kind in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+
+
+# ================= ROLLUPS =================
+def day_of(ts):
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+def _upsert(conn, table, keys, deltas):
+    cols = list(keys) + list(deltas)
+    marks = ", ".join("?" * len(cols))
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in deltas)
+    conn.execute(
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({marks}) "
+        f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}",
+        tuple(keys.values()) + tuple(deltas.values())
+    )
+
+
+def bump_rollups(conn, ts, admin_id=None, **deltas):
+    """Add deltas to the day's totals, and to the admin's if one is given"""
+    day = day_of(ts)
+    _upsert(conn, "daily_rollup", {"day": day}, deltas)
+    if admin_id is not None:
+        deltas.pop("orders", None)
+        if deltas:
+            _upsert(
+                conn, "admin_rollup", {"day": day, "admin_id": admin_id}, deltas
+            )
+
+
+def daily_report(conn, days=7):
+    """Rollup rows for the last `days` days, newest first"""
+    since = day_of(time.time() - (days - 1) * 86400)
+    return conn.execute(
+        "SELECT day, orders, accepted, completed, revenue, accept_seconds "
+        "FROM daily_rollup WHERE day >= ? ORDER BY day DESC",
+        (since,)
+    ).fetchall()
+
+
+def admin_report(conn, day=None):
+    return conn.execute(
+        "SELECT admin_id, accepted, completed, revenue, accept_seconds "
+        "FROM admin_rollup WHERE day = ? ORDER BY completed DESC",
+        (day or day_of(time.time()),)
+    ).fetchall()
@@ -0,0 +1,156 @@
+# digest.py
+import asyncio
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+
+from config import DIGEST_WINDOW, DIGEST_SIZE
+from outbox import PRIORITY_ADMIN
+
+
+class Board:
+    """One batch of orders shown to an admin: an album of the order photos
+    plus a single message carrying every order's Accept/Reject buttons."""
+
+    __slots__ = ("admin_id", "message_id", "rows", "single", "dirty")
+
+    def __init__(self, admin_id, items):
+        self.admin_id = admin_id
+        self.message_id = None
+        # Token -> [summary line, status]; status None while still open
+        self.rows = {token: [summary, None] for token, _, _, summary in items}
+        # A lone order goes out as one photo with the buttons on its caption
+        self.single = items[0][2] if len(items) == 1 else None
+        self.dirty = False
+
+    def text(self):
+        if self.single is not None:
+            (summary, status), = self.rows.values()
+            return self.single + (f"\n\n{status}" if status else "")
+        lines = [f"📦 {len(self.rows)} NEW ORDERS"]
+        for summary, status in self.rows.values():
+            lines.append(f"{summary}  {status}" if status else summary)
+        return "\n".join(lines)
+
+    def keyboard(self):
+        kb = [
+            [
+                InlineKeyboardButton(f"Accept ✅ {token}", callback_data=f"accept_{token}"),
+                InlineKeyboardButton(f"Reject ❌ {token}", callback_data=f"reject_{token}"),
+            ]
+            for token, (_, status) in self.rows.items() if status is None
+        ]
+        return InlineKeyboardMarkup(kb)
+
+    def is_open(self):
+        return any(status is None for _, status in self.rows.values())
+
+
+class AdminDigest:
+    """Batches new-order notifications per admin.
+
+    Orders for an admin collect for DIGEST_WINDOW seconds (or until
+    DIGEST_SIZE of them are waiting) and go out as one album plus one
+    keyboard message. When an order is taken, moved on or expires, its
+    row on the board is edited in place instead of sending anything new;
+    changes within one window share a single edit.
+    """
+
+    def __init__(self, outbox, window=DIGEST_WINDOW, size=DIGEST_SIZE):
+        self.outbox = outbox
+        self.window = window
+        self.size = min(size, 10)     # Telegram's album limit
+        self.pending = {}             # Admin ID -> [(token, image, caption, summary)]
+        self.timers = {}              # Admin ID -> flush task
+        self.boards = {}              # Token -> Board it is on
+
+    def add(self, admin_id, token, image, caption, summary):
+        queue = self.pending.setdefault(admin_id, [])
+        queue.append((token, image, caption, summary))
+        if len(queue) >= self.size:
+            self._schedule(admin_id, 0)
+        elif admin_id not in self.timers:
+            self._schedule(admin_id, self.window)
+
+    def __contains__(self, token):
+        return token in self.boards
+
+    def resolve(self, token, status):
+        """Mark an order as no longer waiting on the admin it was shown to"""
+        board = self.boards.pop(token, None)
+        if board is None:
+            # Not sent yet: just leave it out of the batch
+            for queue in self.pending.values():
+                queue[:] = [item for item in queue if item[0] != token]
+            return
+        board.rows[token][1] = status
+        if board.dirty:
+            return                    # An edit is already on its way
+        board.dirty = True
+        if board.message_id is not None:
+            # Let other rows settle too, so one edit covers several orders
+            asyncio.get_running_loop().call_later(self.window, self._edit, board)
+
+    # ---------- sending ----------
+    def _schedule(self, admin_id, delay):
+        timer = self.timers.pop(admin_id, None)
+        if timer:
+            timer.cancel()
+        self.timers[admin_id] = asyncio.create_task(
+            self._flush_after(admin_id, delay)
+        )
+
+    async def _flush_after(self, admin_id, delay):
+        await asyncio.sleep(delay)
+        # Out of self.timers before taking the queue, so it is never cancelled mid-send
+        self.timers.pop(admin_id, None)
+        items = self.pending.pop(admin_id, [])
+        for i in range(0, len(items), self.size):
+            await self._send(admin_id, items[i:i + self.size])
+
+    async def _send(self, admin_id, items):
+        board = Board(admin_id, items)
+        for token, *_ in items:
+            self.boards[token] = board
+
+        if board.single is not None:
+            future = self.outbox.send_photo(
+                admin_id, items[0][1], priority=PRIORITY_ADMIN,
+                caption=board.text(), reply_markup=board.keyboard()
+            )
+        else:
+            self.outbox.send(
+                PRIORITY_ADMIN, "send_media_group", admin_id,
+                media=[InputMediaPhoto(image, caption=caption)
+                       for _, image, caption, _ in items]
+            )
+            future = self.outbox.send_message(
+                admin_id, board.text(), priority=PRIORITY_ADMIN,
+                reply_markup=board.keyboard()
+            )
+        try:
+            message = await future
+        except Exception:
+            return                    # Already logged by the outbox
+        board.message_id = message.message_id
+        if board.dirty:
+            self._edit(board)
+
+    def _edit(self, board):
+        board.dirty = False
+        markup = board.keyboard() if board.is_open() else None
+        if board.single is not None:
+            self.outbox.edit(
+                "edit_message_caption", board.admin_id, board.message_id,
+                caption=board.text(), reply_markup=markup
+            )
+        else:
+            self.outbox.edit(
+                "edit_message_text", board.admin_id, board.message_id,
+                text=board.text(), reply_markup=markup
+            )
+
+    async def stop(self):
+        """Send whatever is still waiting for its window"""
+        for admin_id in list(self.timers):
+            self._schedule(admin_id, 0)
+        await asyncio.gather(*self.timers.values(), return_exceptions=True)
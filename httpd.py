@@ -0,0 +1,94 @@
+# httpd.py
+# Tiny asyncio HTTP/1.1 server for the webhook and local endpoints.
+import asyncio
+import json
+
+MAX_BODY = 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Response:
+    def __init__(self, status=200, body=b"", content_type="text/plain", headers=None):
+        self.status = status
+        self.body = body.encode() if isinstance(body, str) else body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+    @classmethod
+    def json(cls, data, status=200):
+        return cls(status, json.dumps(data), "application/json")
+
+
+async def serve(handler, host, port):
+    """Start serving; handler(method, path, headers, body) -> Response"""
+
+    async def connection(reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if body is None:
+                    response = Response(413, "too large")
+                else:
+                    try:
+                        response = await handler(method, path, headers, body)
+                    except Exception as e:
+                        print(f"⚠️ HTTP handler error on {path}: {e}")
+                        response = Response(500, "error")
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(_encode(response, keep_alive))
+                await writer.drain()
+                if not keep_alive or body is None:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(connection, host, port)
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    path = target.split("?", 1)[0]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        return method, path, headers, None
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _encode(response, keep_alive):
+    head = [
+        f"HTTP/1.1 {response.status} {REASONS.get(response.status, 'OK')}",
+        f"Content-Type: {response.content_type}",
+        f"Content-Length: {len(response.body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head += [f"{k}: {v}" for k, v in response.headers.items()]
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body
@@ -0,0 +1,158 @@
+# journal.py
+# Append-only journal of order lifecycle events, one JSON object per line,
+# in size-bounded segment files named after their first event's time.
+#   python journal.py export 2026-10-01 2026-10-31 [csv|jsonl] > orders.csv
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from config import JOURNAL_DIR, JOURNAL_SEGMENT_BYTES
+from writer import BatchWriter
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_FORMAT = "%Y%m%dT%H%M%S"
+EXPORT_FIELDS = ("time", "event", "token", "admin", "customer", "detail")
+
+
+class Journal:
+    """Order events appended to disk by a single writer thread.
+
+    record() only formats the line and queues it; the writer drains the
+    queue in batches, so the event loop never waits on file I/O.
+    """
+
+    def __init__(self, path=JOURNAL_DIR, segment_bytes=JOURNAL_SEGMENT_BYTES):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.file = None
+        self.size = 0
+        self.listeners = []   # fn(entry), called inline for every event
+        self.writer = BatchWriter(self._write, "Journal", "events")
+
+    def record(self, event, token=None, **fields):
+        entry = {"ts": round(time.time(), 3), "event": event, "token": token}
+        entry.update(fields)
+        for listener in self.listeners:
+            listener(entry)
+        self.writer.put(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    # ---------- lifecycle ----------
+    async def open(self):
+        self.writer.start()
+
+    async def close(self):
+        await self.writer.stop()
+        if self.file:
+            await self.writer.run(self.file.close)
+            self.file = None
+
+    # ---------- files (writer thread) ----------
+    def _write(self, lines):
+        data = "".join(lines).encode()
+        if self.file is None or (
+            self.size and self.size + len(data) > self.segment_bytes
+        ):
+            self._rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def _rotate(self):
+        if self.file:
+            self.file.close()
+        os.makedirs(self.path, exist_ok=True)
+        # Always a fresh file, even when the last one started this second
+        stamp = SEGMENT_PREFIX + time.strftime(SEGMENT_FORMAT)
+        name, n = stamp + ".jsonl", 0
+        while os.path.exists(os.path.join(self.path, name)):
+            n += 1
+            name = f"{stamp}-{n}.jsonl"
+        self.file = open(os.path.join(self.path, name), "xb")
+        self.size = 0
+
+
+# ================= READING =================
+def segments(path=JOURNAL_DIR):
+    """[(start_ts, file path)] oldest first"""
+    if not os.path.isdir(path):
+        return []
+    found = []
+    for name in os.listdir(path):
+        if not (name.startswith(SEGMENT_PREFIX) and name.endswith(".jsonl")):
+            continue
+        # "-N" marks further segments started within the same second
+        stamp, _, n = name[len(SEGMENT_PREFIX):-len(".jsonl")].partition("-")
+        try:
+            start = time.mktime(time.strptime(stamp, SEGMENT_FORMAT))
+            n = int(n or 0)
+        except ValueError:
+            continue
+        found.append((start, n, os.path.join(path, name)))
+    return [(start, seg_path) for start, _, seg_path in sorted(found)]
+
+
+def events(start, end, path=JOURNAL_DIR):
+    """Events with start <= ts < end, read one line at a time"""
+    found = segments(path)
+    for i, (seg_start, seg_path) in enumerate(found):
+        if seg_start >= end:
+            break
+        # Whole segment is older than the range if the next one starts before
+        # it; names only have whole seconds, so allow for the one in progress
+        if i + 1 < len(found) and found[i + 1][0] + 1 <= start:
+            continue
+        with open(seg_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue    # Line still being written
+                if start <= entry["ts"] < end:
+                    yield entry
+
+
+def export(start, end, fmt="csv", path=JOURNAL_DIR, chunk_rows=1000):
+    """Yield the export as text chunks of up to chunk_rows events"""
+    buf = io.StringIO()
+    out = csv.writer(buf) if fmt == "csv" else None
+    if out:
+        out.writerow(EXPORT_FIELDS)
+    rows = 0
+    for entry in events(start, end, path):
+        if out:
+            detail = {
+                k: v for k, v in entry.items()
+                if k not in ("ts", "event", "token", "admin", "customer")
+            }
+            out.writerow((
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["ts"])),
+                entry["event"], entry.get("token"), entry.get("admin"),
+                entry.get("customer"), json.dumps(detail) if detail else "",
+            ))
+        else:
+            buf.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def day_range(first, last):
+    """(start, end) timestamps covering the local days first..last inclusive"""
+    start = time.mktime(time.strptime(first, "%Y-%m-%d"))
+    end = time.mktime(time.strptime(last, "%Y-%m-%d")) + 86400
+    return start, end
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "export":
+        sys.exit("usage: python journal.py export FROM TO [csv|jsonl]")
+    fmt = sys.argv[4] if len(sys.argv) > 4 else "csv"
+    for chunk in export(*day_range(sys.argv[2], sys.argv[3]), fmt=fmt):
+        sys.stdout.write(chunk)
@@ -0,0 +1,525 @@
+# loadtest.py
+# Synthetic load for the full order lifecycle against a local stand-in
+# for the Telegram Bot API.
+#   python loadtest.py --customers 200 --admins 10 [--reject 0.1] [--chat 2]
+#                      [--flood 5]
+#
+# The bot runs unchanged (same build_app(), same polling loop); only
+# BOT_API_URL points it at FakeBotAPI instead of api.telegram.org.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs
+
+import httpd
+
+BOT_ID = 999
+MAIN_ADMIN = 1
+JSON_PARAMS = {"chat_id", "from_chat_id", "message_id", "reply_markup",
+               "media", "offset", "limit", "timeout"}
+
+
+class FakeBotAPI:
+    """Just enough of the Bot API for the bot's order flow.
+
+    Outbound calls are recorded and delivered to per-chat inboxes that
+    the simulated users read from. Inbound updates are served through
+    getUpdates long polling, like the real server.
+    """
+
+    def __init__(self, latency=0.0, deliver=True):
+        self.latency = latency                   # Seconds added to every call
+        self.deliver = deliver                   # False: count calls, keep nothing
+        self.updates = []
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1000)
+        self.new_update = asyncio.Event()
+        self.inbox = defaultdict(asyncio.Queue)  # Chat ID -> outbound messages
+        self.calls = defaultdict(int)            # Method -> count
+        self.call_log = []                       # (time, method, params)
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await httpd.serve(self.handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}/bot"
+
+    async def stop(self):
+        # Release any getUpdates still long-polling before closing
+        self.new_update.set()
+        await asyncio.sleep(0.1)
+        self.server.close()
+
+    # ---------- inbound ----------
+    def push_update(self, update):
+        update["update_id"] = next(self.update_ids)
+        self.updates.append(update)
+        self.new_update.set()
+
+    async def get_updates(self, offset, timeout):
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self.new_update.clear()
+            try:
+                await asyncio.wait_for(self.new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:100]
+
+    # ---------- outbound ----------
+    async def handle(self, method, path, headers, body):
+        api_method = path.rsplit("/", 1)[-1]
+        params = _parse_params(headers, body)
+        self.calls[api_method] += 1
+        if self.deliver:
+            self.call_log.append((time.perf_counter(), api_method, params))
+
+        if self.latency and api_method != "getUpdates":
+            await asyncio.sleep(self.latency)
+
+        if api_method == "getUpdates":
+            result = await self.get_updates(
+                int(params.get("offset") or 0), float(params.get("timeout") or 0)
+            )
+        elif api_method == "getMe":
+            result = _user(BOT_ID, is_bot=True, username="fake_bot")
+        elif api_method == "getChat":
+            chat_id = int(params["chat_id"])
+            result = {"id": chat_id, "type": "private", "first_name": f"User{chat_id}"}
+        elif api_method in ("sendMessage", "sendPhoto", "sendDocument",
+                            "editMessageText", "editMessageCaption",
+                            "editMessageReplyMarkup"):
+            result = self._message(params, api_method)
+        elif api_method == "sendMediaGroup":
+            result = [
+                self._message({"chat_id": params["chat_id"], "caption": m.get("caption")},
+                              api_method)
+                for m in params.get("media", [])
+            ]
+        elif api_method in ("copyMessage", "copyMessages"):
+            # message_id names the source message, not the copy
+            msg = self._message({"chat_id": params["chat_id"]}, api_method)
+            result = {"message_id": msg["message_id"]}
+            if api_method == "copyMessages":
+                result = [result]
+        else:
+            result = True
+        return httpd.Response.json({"ok": True, "result": result})
+
+    def _message(self, params, api_method):
+        chat_id = int(params["chat_id"])
+        msg = {
+            "message_id": params.get("message_id") or next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": _user(BOT_ID, is_bot=True),
+        }
+        if "text" in params:
+            msg["text"] = params["text"]
+        if "caption" in params and params["caption"] is not None:
+            msg["caption"] = params["caption"]
+        if "photo" in params:
+            msg["photo"] = [_photo(params["photo"])]
+        if "document" in params:
+            doc = params["document"]
+            msg["document"] = {"file_id": "upload", "file_unique_id": "upload",
+                               "file_size": len(doc)}
+        markup = params.get("reply_markup")
+        if isinstance(markup, dict) and "inline_keyboard" in markup:
+            msg["reply_markup"] = markup
+        if self.deliver:
+            self.inbox[chat_id].put_nowait((time.perf_counter(), api_method, msg))
+        return msg
+
+    async def receive(self, chat_id, match, timeout=30):
+        """Next outbound message to chat_id whose text/caption matches"""
+        queue = self.inbox[chat_id]
+        deadline = time.perf_counter() + timeout
+        while True:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                raise TimeoutError(f"chat {chat_id} never got {match!r}")
+            at, _, msg = await asyncio.wait_for(queue.get(), left)
+            body = msg.get("text") or msg.get("caption") or ""
+            if re.search(match, body):
+                return at, msg
+
+
+# ================= UPDATE BUILDERS =================
+def _user(uid, is_bot=False, username=None):
+    user = {"id": uid, "is_bot": is_bot, "first_name": f"User{uid}"}
+    if username:
+        user["username"] = username
+    return user
+
+
+def _photo(file_id):
+    return {"file_id": file_id, "file_unique_id": file_id[:16],
+            "width": 640, "height": 480}
+
+
+message_ids = itertools.count(1)
+
+
+def text_update(uid, text):
+    msg = {"message_id": next(message_ids), "date": int(time.time()),
+           "chat": {"id": uid, "type": "private"}, "from": _user(uid),
+           "text": text}
+    if text.startswith("/"):
+        msg["entities"] = [{"type": "bot_command", "offset": 0,
+                            "length": len(text.split()[0])}]
+    return {"message": msg}
+
+
+def photo_update(uid, file_id="food-photo", media_group_id=None):
+    update = {"message": {"message_id": next(message_ids), "date": int(time.time()),
+                          "chat": {"id": uid, "type": "private"},
+                          "from": _user(uid), "photo": [_photo(file_id)]}}
+    if media_group_id:
+        update["message"]["media_group_id"] = media_group_id
+    return update
+
+
+def voice_update(uid, file_id="voice-note"):
+    return {"message": {"message_id": next(message_ids), "date": int(time.time()),
+                        "chat": {"id": uid, "type": "private"}, "from": _user(uid),
+                        "voice": {"file_id": file_id, "file_unique_id": file_id,
+                                  "duration": 3}}}
+
+
+def callback_update(uid, data, message=None):
+    message = message or {"message_id": next(message_ids), "date": int(time.time()),
+                          "chat": {"id": uid, "type": "private"},
+                          "from": _user(BOT_ID, is_bot=True), "text": "."}
+    return {"callback_query": {"id": str(next(message_ids)), "from": _user(uid),
+                               "chat_instance": str(uid), "data": data,
+                               "message": message}}
+
+
+def _parse_params(headers, body):
+    if not body:
+        return {}
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith("multipart/form-data"):
+        # File uploads: keep the files' bytes, decode everything else
+        form = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        fields = {}
+        for part in form.iter_parts():
+            data = part.get_payload(decode=True)
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = [data if part.get_filename() else data.decode()]
+    else:
+        fields = parse_qs(body.decode(), keep_blank_values=True)
+    params = {}
+    for key, values in fields.items():
+        value = values[0]
+        if key in JSON_PARAMS:
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        params[key] = value
+    return params
+
+
+def _buttons(msg):
+    markup = msg.get("reply_markup") or {}
+    return [b.get("callback_data") for row in markup.get("inline_keyboard", [])
+            for b in row]
+
+
+# ================= SIMULATED USERS =================
+class Stats:
+    def __init__(self):
+        self.placed = {}          # Token -> time COD/UPI was sent
+        self.notified = {}        # Token -> first admin notification
+        self.accepted = {}        # Token -> accept time
+        self.completed = 0
+        self.rejected = 0
+        self.failures = []
+
+
+async def run_customer(api, stats, uid, chat_messages, prepaid):
+    api.push_update(text_update(uid, "/start"))
+    await api.receive(uid, "Welcome")
+    api.push_update(callback_update(uid, "order"))
+    await api.receive(uid, "address")
+    api.push_update(text_update(uid, f"https://maps.example/{uid}"))
+    await api.receive(uid, "image")
+    api.push_update(photo_update(uid, f"photo-{uid}"))
+    await api.receive(uid, "item total")
+    api.push_update(text_update(uid, str(random.randint(149, 900))))
+    await api.receive(uid, "GST")
+    api.push_update(text_update(uid, str(random.randint(5, 60))))
+    await api.receive(uid, "Choose payment")
+
+    started = time.perf_counter()
+    if prepaid:
+        api.push_update(callback_update(uid, "prepaid"))
+        await api.receive(uid, "UPI")
+        started = time.perf_counter()
+        api.push_update(text_update(uid, f"user{uid}@upi"))
+    else:
+        api.push_update(callback_update(uid, "cod"))
+
+    _, msg = await api.receive(uid, r"Order placed|No admin")
+    found = re.search(r"Token: (\d+)", msg["text"])
+    if not found:
+        stats.failures.append(f"customer {uid}: {msg['text']}")
+        return
+    token = int(found.group(1))
+    stats.placed[token] = started
+
+    # Check on it the way customers are asked to, rather than in the chat
+    api.push_update(text_update(uid, "/status"))
+    _, msg = await api.receive(
+        uid, rf"Token {token} ·|has been accepted", timeout=120
+    )
+    if "has been accepted" not in msg["text"]:
+        await api.receive(uid, "has been accepted", timeout=120)
+    for i in range(chat_messages):
+        api.push_update(text_update(uid, f"where is my order? ({i})"))
+    if chat_messages:
+        api.push_update(voice_update(uid))
+        for i in range(2):
+            api.push_update(photo_update(uid, f"menu-{uid}-{i}", f"album-{uid}"))
+    await api.receive(uid, "Order Dispatched", timeout=120)
+    stats.completed += 1
+
+
+async def run_flooder(api, uid, count):
+    # /start costs a reply every time it gets through
+    for _ in range(count):
+        api.push_update(text_update(uid, "/start"))
+        await asyncio.sleep(0)
+
+
+async def run_admin(api, stats, uid, reject_rate, chat_messages, stop):
+    api.push_update(text_update(uid, "/start"))
+    await api.receive(uid, "Admin Panel")
+    api.push_update(text_update(uid, "Online ✅"))
+    await api.receive(uid, "Status updated")
+
+    # tracking_wait holds one token per admin, so finish orders one at a time
+    completes = []
+    awaiting_link = False
+    handled = set()   # (message_id, token): digest boards are re-sent on every edit
+
+    queue = api.inbox[uid]
+    while not stop.is_set():
+        try:
+            at, _, msg = await asyncio.wait_for(queue.get(), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        buttons = _buttons(msg)
+
+        accepts = [b for b in buttons if b.startswith("accept_")]
+        for accept in accepts:
+            token = int(accept.split("_")[1])
+            if (msg["message_id"], token) in handled:
+                continue
+            handled.add((msg["message_id"], token))
+            stats.notified.setdefault(token, at)
+            if random.random() < reject_rate:
+                stats.rejected += 1
+                api.push_update(callback_update(uid, f"reject_{token}", msg))
+            else:
+                stats.accepted[token] = time.perf_counter()
+                api.push_update(callback_update(uid, accept, msg))
+        if accepts:
+            continue
+
+        complete = next((b for b in buttons if b.startswith("complete_")), None)
+        if complete:
+            for i in range(chat_messages):
+                api.push_update(text_update(uid, f"on the way ({i})"))
+            completes.append((complete, msg))
+        elif "Send tracking link" in (msg.get("text") or ""):
+            api.push_update(text_update(uid, "https://track.example/123"))
+            awaiting_link = False
+
+        if completes and not awaiting_link:
+            complete, msg = completes.pop(0)
+            api.push_update(callback_update(uid, complete, msg))
+            awaiting_link = True
+
+
+# ================= REPORT =================
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def timed_handlers(app, timings):
+    """Wrap every handler callback to record its latency"""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            name = handler.callback.__name__
+
+            def wrap(callback, name=name):
+                async def timed(update, context):
+                    start = time.perf_counter()
+                    try:
+                        return await callback(update, context)
+                    finally:
+                        timings[name].append(time.perf_counter() - start)
+                return timed
+
+            handler.callback = wrap(handler.callback)
+
+
+def report(stats, api, timings, took, flooders=()):
+    ms = lambda s: f"{s * 1000:8.1f} ms"
+    orders = max(stats.completed, 1)
+    outbound = {m: n for m, n in api.calls.items()
+                if m not in ("getUpdates", "getMe")}
+
+    print(f"\n📦 Completed orders: {stats.completed} in {took:.1f}s "
+          f"({stats.completed / took:.1f} orders/sec)")
+    print(f"   Rejections: {stats.rejected}, failures: {len(stats.failures)}")
+    for failure in stats.failures[:5]:
+        print(f"   ⚠️ {failure}")
+
+    notify = [stats.notified[t] - stats.placed[t]
+              for t in stats.placed if t in stats.notified]
+    print("\n⏱ Order → admin notification")
+    for pct in (50, 95, 99):
+        print(f"   p{pct}: {ms(percentile(notify, pct))}")
+
+    print("\n🧩 Handler latency        p50         p95         p99      calls")
+    for name, values in sorted(timings.items()):
+        print(f"   {name:<18}" + "".join(
+            f"{ms(percentile(values, p)):>12}" for p in (50, 95, 99)
+        ) + f"{len(values):>11}")
+
+    print(f"\n📡 Outbound API calls per order: {sum(outbound.values()) / orders:.1f}")
+    for method, count in sorted(outbound.items(), key=lambda kv: -kv[1]):
+        print(f"   {method:<24}{count:>8}  ({count / orders:.2f}/order)")
+
+    import metrics
+    limited = metrics.updates_limited.values
+    print(f"\n🚫 Rate-limited updates: "
+          + (", ".join(f"{r} {n}" for r, n in limited.items()) or "none"))
+    for uid in flooders:
+        print(f"   flooder {uid}: {api.inbox[uid].qsize()} replies")
+
+
+# ================= MAIN =================
+async def main(args):
+    api = FakeBotAPI(latency=args.latency / 1000)
+    os.environ["BOT_API_URL"] = await api.start()
+
+    # Imported late: config is read from the environment at import time
+    import bot
+
+    app = bot.build_app()
+    timings = defaultdict(list)
+    timed_handlers(app, timings)
+
+    await app.initialize()
+    await app.post_init(app)
+    await app.updater.start_polling(poll_interval=0, timeout=1)
+    await app.start()
+
+    stats = Stats()
+    stop = asyncio.Event()
+    admin_ids = [100 + i for i in range(args.admins)]
+    for aid in admin_ids:
+        api.push_update(text_update(MAIN_ADMIN, "Add New Admin ➕"))
+        await api.receive(MAIN_ADMIN, "Send Telegram User ID")
+        api.push_update(text_update(MAIN_ADMIN, str(aid)))
+        await api.receive(MAIN_ADMIN, "Admin added")
+    admins = [
+        asyncio.create_task(
+            run_admin(api, stats, aid, args.reject, args.chat, stop)
+        )
+        for aid in admin_ids
+    ]
+    await asyncio.sleep(0.5)
+
+    start = time.perf_counter()
+    flooders = [90000 + i for i in range(args.flood)]
+    customers = [
+        run_customer(api, stats, 10000 + i, args.chat, random.random() < 0.3)
+        for i in range(args.customers)
+    ] + [run_flooder(api, uid, args.flood_updates) for uid in flooders]
+    results = await asyncio.gather(*customers, return_exceptions=True)
+    took = time.perf_counter() - start
+    stats.failures += [repr(r) for r in results if isinstance(r, Exception)]
+
+    stop.set()
+    await asyncio.gather(*admins)
+
+    # One dispute lookup, once the chats have been written out
+    await asyncio.sleep(0.2)
+    lookup = None
+    if stats.placed:
+        asked = time.perf_counter()
+        api.push_update(text_update(MAIN_ADMIN, f"/transcript {min(stats.placed)}"))
+        _, reply = await api.receive(MAIN_ADMIN, "")
+        lookup = (time.perf_counter() - asked, reply)
+    await app.updater.stop()
+    await app.stop()
+    await app.post_shutdown(app)
+    await app.shutdown()
+    await api.stop()
+
+    report(stats, api, timings, took, flooders)
+    print(f"\n📝 Transcripts on disk: {len(bot.transcripts.index)} orders")
+    if lookup:
+        took, reply = lookup
+        doc = reply.get("document")
+        print(f"   /transcript {min(stats.placed)}: "
+              + (f"{doc['file_size']} byte document" if doc else reply.get("text"))
+              + f" in {took * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=100)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--reject", type=float, default=0.1,
+                        help="chance an admin rejects an order")
+    parser.add_argument("--chat", type=int, default=2,
+                        help="chat messages each side sends per order")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="milliseconds the fake API takes per call")
+    parser.add_argument("--throttled", action="store_true",
+                        help="keep the outbox's real Telegram rate limits")
+    parser.add_argument("--flood", type=int, default=0,
+                        help="users who spam /start alongside the customers")
+    parser.add_argument("--flood-updates", type=int, default=500,
+                        help="updates each of those users sends")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ.setdefault("BOT_TOKEN", "123456:loadtest")
+    os.environ["MAIN_ADMIN_ID"] = str(MAIN_ADMIN)
+    os.environ["DB_PATH"] = os.path.join(tmp, "orders.db")
+    os.environ["STATE_DB_PATH"] = os.path.join(tmp, "state.db")
+    os.environ.setdefault("JOURNAL_DIR", os.path.join(tmp, "journal"))
+    os.environ.setdefault("TRANSCRIPT_DIR", os.path.join(tmp, "transcripts"))
+    os.environ.setdefault("METRICS_PORT", "0")
+    # The simulated admins click far faster than people can
+    os.environ.setdefault("RATE_LIMITS", "customer:1:20")
+    if not args.throttled:
+        os.environ["OUTBOX_GLOBAL_RATE"] = "100000"
+        os.environ["OUTBOX_CHAT_RATE"] = "100000"
+        os.environ["OUTBOX_CHAT_BURST"] = "100000"
+
+    asyncio.run(main(args))
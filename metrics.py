@@ -0,0 +1,197 @@
+# metrics.py
+# In-process metrics served in Prometheus text format on /metrics.
+# Recording is a dict lookup, a bisect and two additions, cheap enough
+# to leave on for every update.
+import functools
+import os
+import time
+from bisect import bisect_left
+
+from telegram.request import HTTPXRequest
+
+import httpd
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1, 2.5, 5, 10)
+
+REGISTRY = []
+
+
+class Counter:
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, label_value=None, n=1):
+        self.values[label_value] = self.values.get(label_value, 0) + n
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for value, count in self.values.items():
+            yield f"{self.name}{_labels(self.label, value)} {count}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time, so nothing is paid per update"""
+
+    def __init__(self, name, help_text, read=None, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.read = read      # () -> number, or {label_value: number}
+        REGISTRY.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        if self.read is None:
+            return
+        value = self.read()
+        if isinstance(value, dict):
+            for label_value, v in value.items():
+                yield f"{self.name}{_labels(self.label, label_value)} {v}"
+        else:
+            yield f"{self.name} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, label=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.series = {}      # Label value -> [bucket counts..., sum, count]
+        REGISTRY.append(self)
+
+    def observe(self, value, label_value=None):
+        series = self.series.get(label_value)
+        if series is None:
+            series = self.series[label_value] = [0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_value, series in self.series.items():
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                running += count
+                yield (f"{self.name}_bucket"
+                       f"{_labels(self.label, label_value, le=bound)} {running}")
+            yield f"{self.name}_sum{_labels(self.label, label_value)} {series[-2]}"
+            yield f"{self.name}_count{_labels(self.label, label_value)} {series[-1]}"
+
+
+def _labels(label, value, le=None):
+    parts = []
+    if label is not None and value is not None:
+        parts.append(f'{label}="{value}"')
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ================= BOT METRICS =================
+handler_seconds = Histogram(
+    "bot_handler_seconds", "Time spent in each handler", label="handler"
+)
+api_seconds = Histogram(
+    "bot_api_seconds", "Outbound Bot API call latency", label="method"
+)
+api_errors = Counter(
+    "bot_api_errors_total", "Failed outbound Bot API calls", label="method"
+)
+accept_seconds = Histogram(
+    "order_accept_seconds", "Time from order placed to first admin accept",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+escalations_per_order = Histogram(
+    "order_escalations", "Escalation rounds an order needed before accept",
+    buckets=(0, 1, 2, 3, 5, 8, 13),
+)
+escalations_total = Counter(
+    "order_escalations_total", "Orders moved on to another admin", label="reason"
+)
+admission_wait_seconds = Histogram(
+    "admission_wait_seconds", "Time an order waited in line for a free admin",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+admission_total = Counter(
+    "admission_orders_total", "Orders that had to wait for an admin",
+    label="outcome"
+)
+updates_limited = Counter(
+    "bot_updates_limited_total", "Incoming updates dropped by the per-user "
+    "rate limit", label="role"
+)
+
+
+def resident_bytes():
+    """Current RSS on Linux; 0 where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return 0
+
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+Gauge("process_resident_memory_bytes", "Resident memory size", resident_bytes)
+
+
+def timed(name):
+    """Record the decorated coroutine's latency under bot_handler_seconds"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                handler_seconds.observe(time.perf_counter() - start, name)
+        return wrapper
+    return decorate
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that times every Bot API call by method"""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            api_errors.inc(api_method)
+            raise
+        finally:
+            # getUpdates is a long poll; its latency is mostly idle time
+            if api_method != "getUpdates":
+                api_seconds.observe(time.perf_counter() - start, api_method)
+        if code != 200:
+            api_errors.inc(api_method)
+        return code, payload
+
+
+async def serve(host, port):
+    async def handle(method, path, headers, body):
+        if path != "/metrics":
+            return httpd.Response(404, "not found")
+        return httpd.Response(
+            200, render(), "text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    return await httpd.serve(handle, host, port)
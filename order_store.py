@@ -0,0 +1,354 @@
+# order_store.py
+import json
+import time
+
+import database
+from config import (
+    DB_PATH,
+    STATE_BACKEND,
+    ORDER_FLUSH_INTERVAL,
+    ORDER_FLUSH_BATCH,
+    ORDER_RETRY_INTERVAL,
+)
+from search import OrderIndex
+from writer import BatchWriter
+
+LIVE_STATUSES = ("pending", "accepted")
+
+
+class OrderStore:
+    """Live orders kept in memory and written behind to the orders table.
+
+    Reads are plain dict lookups. Every change is queued and a single
+    writer task commits the queue in batches on its own thread, so the
+    event loop never waits on sqlite. A reverse index from customer to
+    their live tokens is kept alongside, so a customer's orders are found
+    without scanning every order, and every saved order also goes into
+    the search index.
+
+    With a shared state backend other workers change the same orders, so
+    every saved snapshot carries a revision and refresh() swaps a cached
+    order for a newer one from the database.
+    """
+
+    def __init__(self, path=DB_PATH, shared=STATE_BACKEND != "memory"):
+        self.path = path
+        self.shared = shared      # Other workers write these orders too
+        self.orders = {}          # Token -> order dict
+        self.by_customer = {}     # Customer ID -> set of live tokens
+        self.search = OrderIndex()  # Live and recently finished orders
+        self.conn = None
+        self.rowids = {}          # Token -> orders.id (writer thread only)
+        self.rolled = {}          # Token -> events already in the rollups (writer thread)
+        self.finishing = set()    # Completed here, final row not yet written
+        self.writer = BatchWriter(
+            self._write_batch, "Order", "order rows", done=self._written,
+            delay=ORDER_FLUSH_INTERVAL, max_batch=ORDER_FLUSH_BATCH,
+            retry=ORDER_RETRY_INTERVAL,
+        )
+
+    # ---------- dict-style access ----------
+    def __contains__(self, token):
+        return token in self.orders
+
+    def __getitem__(self, token):
+        return self.orders[token]
+
+    def __setitem__(self, token, order):
+        self.orders[token] = order
+        self._index(token, order)
+        self.save(token)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def get(self, token, default=None):
+        return self.orders.get(token, default)
+
+    async def fetch(self, token):
+        """Like get(), but falls back to the database on a cache miss.
+
+        Needed when another worker created the order. With a shared
+        backend a cached order is refreshed first, and None comes back
+        once another worker finished it. A single worker holds every live
+        order already, and an order finished here stays finished even
+        while its old live row is all the database has.
+        """
+        if token in self.orders:
+            return await self.refresh(token)
+        if not self.shared or token in self.finishing:
+            return None
+        order = await self.writer.run(self._load_one, token)
+        if order is None or token in self.finishing:
+            return None
+        order = self.orders.setdefault(token, order)
+        self._index(token, order)
+        self.search.add(token, order)
+        return order
+
+    async def refresh(self, token):
+        """The cached order, swapped for a newer revision if another
+        worker saved one; None if it finished there"""
+        order = self.orders.get(token)
+        if order is None or not self.shared:
+            return order
+        newer = await self.writer.run(
+            self._load_newer, token, order.get("rev", 0)
+        )
+        if newer is None or self.orders.get(token) is not order:
+            return self.orders.get(token)
+        if newer["status"] not in LIVE_STATUSES:
+            # Finished elsewhere; that worker already wrote the final row
+            self._drop(token, order)
+            return None
+        order.clear()
+        order.update(newer)       # In place, so held references see it too
+        self.search.add(token, order)
+        return order
+
+    async def fetch_customer(self, customer_id):
+        """[(token, order)] of a customer's live orders, oldest first.
+
+        With a shared backend, falls back to the database when this
+        worker holds none, in case another worker took the order. Those
+        rows are only read, not cached: one completed here may not have
+        been written yet. A single worker holds every live order already.
+        """
+        tokens = self.by_customer.get(customer_id)
+        if tokens:
+            return [(token, self.orders[token]) for token in sorted(tokens)]
+        if not self.shared:
+            return []
+        return await self.writer.run(self._load_customer, customer_id)
+
+    def items(self):
+        return self.orders.items()
+
+    def values(self):
+        return self.orders.values()
+
+    # ---------- writes ----------
+    def save(self, token):
+        """Queue the current state of an order for the writer"""
+        order = self.orders.get(token)
+        if order is None:
+            return
+        order["rev"] = order.get("rev", 0) + 1
+        self.search.add(token, order)
+        cust = order["customer"]
+        row = (token, (
+            cust["id"], cust["name"], cust["address"], cust["image"],
+            cust["final"], order["status"], cust["payment"], cust.get("upi"),
+            order.get("assigned_admin"), order.get("created_at"),
+            order.get("accepted_at"), order.get("completed_at"),
+            json.dumps(order),
+        ))
+        self.writer.put(row)
+
+    def complete(self, token, status="completed"):
+        """Persist the final status and drop the order from memory"""
+        order = self.orders.get(token)
+        if order is None:
+            return
+        order["status"] = status
+        if status == "completed":
+            order["completed_at"] = time.time()
+        self.finishing.add(token)
+        self.save(token)
+        self._drop(token, order)
+
+    def _written(self, finished):
+        self.finishing.difference_update(finished)
+
+    def _drop(self, token, order):
+        del self.orders[token]
+        self.search.retire(token)
+        tokens = self.by_customer.get(order["customer"]["id"])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self.by_customer[order["customer"]["id"]]
+
+    # ---------- lifecycle ----------
+    async def report(self, days=7):
+        """(daily rollup rows, today's per-admin rows) for the main admin"""
+        return await self.writer.run(self._report, days)
+
+    async def open(self):
+        self.orders = await self.writer.run(self._load)
+        recent = await self.writer.run(self._load_recent, self.search.keep_recent)
+        self.by_customer = {}
+        for token, order in self.orders.items():
+            self._index(token, order)
+
+        # Ascending, so the search index only ever appends
+        found = sorted(list(self.orders.items()) + recent, key=lambda t: t[0])
+        for token, order in found:
+            self.search.add(token, order)
+            if token not in self.orders:
+                self.search.retire(token)
+        self.writer.start()
+
+    async def close(self):
+        await self.writer.stop()
+        if self.conn:
+            await self.writer.run(self.conn.close)
+            self.conn = None
+
+    def _index(self, token, order):
+        self.by_customer.setdefault(order["customer"]["id"], set()).add(token)
+
+    # ---------- sqlite (writer thread) ----------
+    def _connection(self):
+        if self.conn is None:
+            self.conn = database.connect(self.path)
+        return self.conn
+
+    def _load(self):
+        conn = self._connection()
+        marks = ",".join("?" * len(LIVE_STATUSES))
+        rows = conn.execute(
+            f"SELECT id, token, data FROM orders "
+            f"WHERE status IN ({marks}) AND data IS NOT NULL ORDER BY id",
+            LIVE_STATUSES
+        ).fetchall()
+
+        orders = {}
+        for rowid, token, data in rows:
+            self.rowids[token] = rowid
+            orders[token] = json.loads(data)
+            self._mark_rolled(token, orders[token])
+        return orders
+
+    def _mark_rolled(self, token, order):
+        # Anything already on disk was counted when it was written
+        done = {"created"}
+        if order["status"] != "pending":
+            done.add("accepted")
+        self.rolled[token] = done
+
+    def _report(self, days):
+        conn = self._connection()
+        return database.daily_report(conn, days), database.admin_report(conn)
+
+    def _load_one(self, token):
+        marks = ",".join("?" * len(LIVE_STATUSES))
+        row = self._connection().execute(
+            f"SELECT id, data FROM orders WHERE token=? AND status IN ({marks}) "
+            f"AND data IS NOT NULL ORDER BY id DESC LIMIT 1",
+            (token,) + LIVE_STATUSES
+        ).fetchone()
+        if row is None:
+            return None
+        self.rowids[token] = row[0]
+        order = json.loads(row[1])
+        self._mark_rolled(token, order)
+        return order
+
+    def _load_newer(self, token, rev):
+        # Newest row of the token, if another worker saved it past `rev`
+        row = self._connection().execute(
+            "SELECT id, data FROM orders WHERE token=? AND data IS NOT NULL "
+            "ORDER BY id DESC LIMIT 1",
+            (token,)
+        ).fetchone()
+        if row is None:
+            return None
+        order = json.loads(row[1])
+        live = order["status"] in LIVE_STATUSES
+        # Same revision: the same snapshot, unless one side finished it
+        if order.get("rev", 0) < rev or (order.get("rev", 0) == rev and live):
+            return None
+        if live:
+            self.rowids[token] = row[0]
+            self._mark_rolled(token, order)
+        else:
+            self.rowids.pop(token, None)
+            self.rolled.pop(token, None)
+        return order
+
+    def _load_recent(self, limit):
+        marks = ",".join("?" * len(LIVE_STATUSES))
+        rows = self._connection().execute(
+            f"SELECT token, data FROM orders WHERE status NOT IN ({marks}) "
+            f"AND data IS NOT NULL ORDER BY id DESC LIMIT ?",
+            LIVE_STATUSES + (limit,)
+        ).fetchall()
+        return [(token, json.loads(data)) for token, data in rows]
+
+    def _load_customer(self, customer_id):
+        marks = ",".join("?" * len(LIVE_STATUSES))
+        rows = self._connection().execute(
+            f"SELECT token, data FROM orders WHERE user_id=? "
+            f"AND status IN ({marks}) AND data IS NOT NULL ORDER BY id",
+            (customer_id,) + LIVE_STATUSES
+        ).fetchall()
+        return [(token, json.loads(data)) for token, data in rows]
+
+    def _write_batch(self, batch):
+        # Only the newest snapshot of each token needs to reach disk
+        latest = dict(batch)
+        conn = self._connection()
+        # Row IDs and rollup marks only hold once the transaction commits;
+        # after a rollback the same IDs get handed out again
+        rowids, rolled = {}, {}
+        with conn:
+            for token, values in latest.items():
+                rowid = self.rowids.get(token)
+                if rowid is not None:
+                    conn.execute(
+                        "UPDATE orders SET user_id=?, user_name=?, address=?, "
+                        "food_image=?, final_price=?, status=?, payment=?, "
+                        "upi=?, assigned_admin=?, created_at=?, accepted_at=?, "
+                        "completed_at=?, data=? WHERE id=?",
+                        values + (rowid,)
+                    )
+                else:
+                    cur = conn.execute(
+                        "INSERT INTO orders (user_id, user_name, address, "
+                        "food_image, final_price, status, payment, upi, "
+                        "assigned_admin, created_at, accepted_at, completed_at, "
+                        "data, token) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        values + (token,)
+                    )
+                    rowids[token] = cur.lastrowid
+                rolled[token] = set(self.rolled.get(token, ()))
+                self._roll_up(conn, values, rolled[token])
+
+        finished = []
+        for token, values in latest.items():
+            if values[5] in LIVE_STATUSES:
+                if token in rowids:
+                    self.rowids[token] = rowids[token]
+                self.rolled[token] = rolled[token]
+            else:
+                self.rowids.pop(token, None)
+                self.rolled.pop(token, None)
+                finished.append(token)
+        return finished
+
+    def _roll_up(self, conn, values, done):
+        """Count lifecycle events this snapshot reaches for the first time,
+        adding them to `done`.
+
+        Runs in the same transaction as the row write, so the rollups
+        never drift from the orders table.
+        """
+        final, admin = values[4], values[8]
+        created_at, accepted_at, completed_at = values[9:12]
+        if "created" not in done:
+            done.add("created")
+            if created_at:
+                database.bump_rollups(conn, created_at, orders=1)
+        if accepted_at and "accepted" not in done:
+            done.add("accepted")
+            waited = accepted_at - created_at if created_at else 0
+            database.bump_rollups(
+                conn, accepted_at, admin, accepted=1, accept_seconds=waited
+            )
+        if completed_at and "completed" not in done:
+            done.add("completed")
+            database.bump_rollups(
+                conn, completed_at, admin, completed=1, revenue=final or 0
+            )
@@ -0,0 +1,257 @@
+# outbox.py
+# Every outbound Bot API call goes through here so we stay under
+# Telegram's flood limits instead of crashing handlers with RetryAfter.
+import asyncio
+import heapq
+import itertools
+from collections import deque
+
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+from config import (
+    OUTBOX_GLOBAL_RATE,
+    OUTBOX_CHAT_RATE,
+    OUTBOX_CHAT_BURST,
+    OUTBOX_RETRIES,
+)
+
+# Lower number goes first
+PRIORITY_ADMIN = 0      # Order notifications to admins
+PRIORITY_CUSTOMER = 1   # Order status messages to customers
+PRIORITY_RELAY = 2      # Chat tunnel traffic
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = None
+
+    def wait_time(self, now):
+        """Seconds until a token is available (0 = available now)"""
+        if self.stamp is not None:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.stamp) * self.rate
+            )
+        self.stamp = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Job:
+    __slots__ = ("priority", "seq", "method", "chat_id", "kwargs", "key",
+                 "future")
+
+    def __init__(self, priority, seq, method, chat_id, kwargs, key, future):
+        self.priority = priority
+        self.seq = seq
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.key = key
+        self.future = future
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Outbox:
+    """Priority queue of Bot API calls drained under rate limits.
+
+    A global token bucket caps total calls/sec and a bucket per chat caps
+    calls to any one chat. Priority decides which chat is served next;
+    within a chat, calls go out one at a time in the order they were
+    queued, so a low-priority relay is never overtaken. RetryAfter pauses the whole outbox for the requested
+    time and retries the call. Edits queued with the same coalesce key
+    replace each other, so only the newest one is sent.
+    """
+
+    def __init__(self, global_rate=OUTBOX_GLOBAL_RATE,
+                 chat_rate=OUTBOX_CHAT_RATE, chat_burst=OUTBOX_CHAT_BURST):
+        self.bot = None
+        self.heap = []
+        self.seq = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}    # Chat ID -> TokenBucket
+        self.chats = {}           # Chat ID -> deque of jobs behind its head
+        self.queued = 0
+        self.coalesce = {}        # Coalesce key -> queued job
+        self.paused_until = 0
+        self.dispatcher = None
+        self.tasks = set()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    # ---------- queueing ----------
+    def send(self, priority, method, chat_id, coalesce_key=None, **kwargs):
+        """Queue bot.<method>(chat_id=chat_id, **kwargs); returns a future"""
+        if coalesce_key is not None and coalesce_key in self.coalesce:
+            job = self.coalesce[coalesce_key]
+            job.kwargs = kwargs
+            return job.future
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_log_failure)
+        job = Job(priority, next(self.seq), method, chat_id, kwargs,
+                  coalesce_key, future)
+        if coalesce_key is not None:
+            self.coalesce[coalesce_key] = job
+        self.queued += 1
+        if chat_id in self.chats:
+            # The chat already has a call queued or in flight
+            self.chats[chat_id].append(job)
+        else:
+            self.chats[chat_id] = deque()
+            self._push(job)
+        return future
+
+    def send_message(self, chat_id, text, priority=PRIORITY_CUSTOMER, **kwargs):
+        return self.send(priority, "send_message", chat_id, text=text, **kwargs)
+
+    def send_photo(self, chat_id, photo, priority=PRIORITY_ADMIN, **kwargs):
+        return self.send(priority, "send_photo", chat_id, photo=photo, **kwargs)
+
+    def edit(self, method, chat_id, message_id, priority=PRIORITY_ADMIN, **kwargs):
+        """Queue an edit_* call; newer edits of the same message replace older ones"""
+        return self.send(
+            priority, method, chat_id, message_id=message_id,
+            coalesce_key=(method, chat_id, message_id), **kwargs
+        )
+
+    def depth(self):
+        """Calls queued but not yet sent"""
+        return self.queued
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    def _push(self, job):
+        heapq.heappush(self.heap, job)
+        self.wakeup.set()
+
+    # ---------- lifecycle ----------
+    def start(self, bot):
+        self.bot = bot
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self, timeout=5):
+        """Give queued calls a moment to drain, then stop"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.chats and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self.dispatcher:
+            self.dispatcher.cancel()
+            self.dispatcher = None
+
+    # ---------- delivery ----------
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.heap:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            job = heapq.heappop(self.heap)
+            while True:
+                now = loop.time()
+                delay = max(
+                    self.paused_until - now, self.global_bucket.wait_time(now)
+                )
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.global_bucket.take()
+            self.queued -= 1
+            if job.key is not None:
+                self.coalesce.pop(job.key, None)
+            task = asyncio.create_task(self._deliver(job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _deliver(self, job):
+        loop = asyncio.get_running_loop()
+        bucket = self.chat_buckets.get(job.chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[job.chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst
+            )
+
+        try:
+            delay = bucket.wait_time(loop.time())
+            if delay:
+                await asyncio.sleep(delay)
+                bucket.wait_time(loop.time())
+            bucket.take()
+
+            attempt = 0
+            while True:
+                try:
+                    result = await getattr(self.bot, job.method)(
+                        chat_id=job.chat_id, **job.kwargs
+                    )
+                    break
+                except RetryAfter as e:
+                    self.retried += 1
+                    retry_after = _seconds(e.retry_after)
+                    self.paused_until = max(
+                        self.paused_until, loop.time() + retry_after
+                    )
+                    await asyncio.sleep(retry_after)
+                except (TimedOut, NetworkError):
+                    attempt += 1
+                    if attempt > OUTBOX_RETRIES:
+                        raise
+                    self.retried += 1
+                    await asyncio.sleep(attempt)
+
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._release(job.chat_id)
+
+    def _release(self, chat_id):
+        waiting = self.chats.get(chat_id)
+        if waiting:
+            self._push(waiting.popleft())
+        else:
+            self.chats.pop(chat_id, None)
+        if len(self.chat_buckets) > 10000:
+            self._trim_buckets()
+
+    def _trim_buckets(self):
+        # Full buckets carry no state worth keeping
+        now = asyncio.get_running_loop().time()
+        for chat_id, bucket in list(self.chat_buckets.items()):
+            if chat_id not in self.chats and not bucket.wait_time(now) \
+                    and bucket.tokens >= bucket.burst:
+                del self.chat_buckets[chat_id]
+
+
+def _seconds(value):
+    return value.total_seconds() if hasattr(value, "total_seconds") else value
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception():
+        print(f"⚠️ Send failed: {future.exception()}")
@@ -0,0 +1,156 @@
+# pricing.py
+# Price rules compiled once into lookup tables: discount tiers by item
+# total (bisect), time-of-day promos (one slot per minute of the day),
+# the minimum order and a per-customer daily cap on discount given.
+import csv
+import io
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from config import MIN_ORDER, DISCOUNT, PRICE_TIERS, PROMOS, DISCOUNT_DAILY_CAP
+
+Quote = namedtuple("Quote", "item gst rate discount final")
+
+
+def parse_tiers(spec):
+    """"500:0.55,1000:0.6" -> [(500.0, 0.55), (1000.0, 0.6)]"""
+    tiers = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        threshold, rate = part.split(":")
+        tiers.append((float(threshold), float(rate)))
+    return tiers
+
+
+def parse_promos(spec):
+    """"22:00-02:00:0.05" -> [(1320, 120, 0.05)] (minutes of the day)"""
+    promos = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        window, extra = part.rsplit(":", 1)
+        start, end = (_minute(t) for t in window.split("-"))
+        promos.append((start, end, float(extra)))
+    return promos
+
+
+def _minute(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class PriceRules:
+    """Discount rate = tier rate for the item total + any promo running now.
+
+    final = item - discount + gst, where discount = item * rate, capped by
+    what the customer has left of DISCOUNT_DAILY_CAP today.
+    """
+
+    def __init__(self, min_order=MIN_ORDER, discount=DISCOUNT, tiers=PRICE_TIERS,
+                 promos=PROMOS, daily_cap=DISCOUNT_DAILY_CAP):
+        self.min_order = min_order
+        self.daily_cap = daily_cap
+
+        table = sorted([(0.0, discount)] + parse_tiers(tiers))
+        self.thresholds = [threshold for threshold, _ in table]
+        self.rates = [rate for _, rate in table]
+
+        self.promo = [0.0] * 1440
+        for start, end, extra in parse_promos(promos):
+            minutes = (
+                range(start, end) if start < end
+                else list(range(start, 1440)) + list(range(0, end))
+            )
+            for m in minutes:
+                self.promo[m] += extra
+
+        self.used = {}            # Customer ID -> discount given today
+        self.used_day = None
+
+    def _promo_now(self, now=None):
+        t = time.localtime(now)
+        return self.promo[t.tm_hour * 60 + t.tm_min]
+
+    def rate(self, item, now=None):
+        tier = self.rates[max(bisect_right(self.thresholds, item) - 1, 0)]
+        return min(tier + self._promo_now(now), 1.0)
+
+    def quote(self, item, gst, customer=None, now=None):
+        if item < self.min_order:
+            raise ValueError(f"Minimum item total is ₹{self.min_order:g}")
+        rate = self.rate(item, now)
+        discount = item * rate
+        if customer is not None and self.daily_cap:
+            discount = min(discount, self.remaining(customer, now))
+        return Quote(item, gst, rate, round(discount, 2),
+                     round(item - discount + gst, 2))
+
+    # ---------- per-customer cap ----------
+    def _today(self, now):
+        day = time.strftime("%Y-%m-%d", time.localtime(now))
+        if day != self.used_day:
+            self.used = {}
+            self.used_day = day
+
+    def remaining(self, customer, now=None):
+        self._today(now)
+        return max(self.daily_cap - self.used.get(customer, 0), 0)
+
+    def charge(self, customer, discount, now=None):
+        """Count a placed order's discount against the customer's cap"""
+        if not self.daily_cap:
+            return
+        self._today(now)
+        self.used[customer] = self.used.get(customer, 0) + discount
+
+    # ---------- bulk ----------
+    def quote_many(self, rows, now=None):
+        """[(item, gst)] -> [Quote or error string], in one pass.
+
+        The promo slot is looked up once for the whole batch, so each row
+        costs a bisect and a few multiplications.
+        """
+        promo = self._promo_now(now)
+        thresholds, rates, min_order = self.thresholds, self.rates, self.min_order
+        out = []
+        for item, gst in rows:
+            if item < min_order:
+                out.append(f"below minimum ₹{min_order:g}")
+                continue
+            rate = min(rates[max(bisect_right(thresholds, item) - 1, 0)] + promo, 1.0)
+            discount = item * rate
+            out.append(Quote(item, gst, rate, round(discount, 2),
+                             round(item - discount + gst, 2)))
+        return out
+
+
+def bulk_quote(text, rules, max_rows=10000):
+    """CSV of item,gst rows -> (CSV with each row's discount and final, rows).
+
+    A header line and blank lines are skipped; rows that don't parse are
+    echoed back with an error instead of failing the whole file.
+    """
+    rows = []                 # (item, gst) or None for a bad row
+    raw = []
+    for row in csv.reader(io.StringIO(text)):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            rows.append((float(row[0]), float(row[1])))
+        except (ValueError, IndexError):
+            if not raw:
+                continue      # Header
+            rows.append(None)
+        raw.append(row)
+        if len(rows) >= max_rows:
+            break
+
+    quotes = iter(rules.quote_many([r for r in rows if r is not None]))
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    out.writerow(("item", "gst", "rate", "discount", "final", "error"))
+    for row, parsed in zip(raw, rows):
+        q = next(quotes) if parsed is not None else "not a number"
+        if isinstance(q, str):
+            out.writerow((",".join(row), "", "", "", "", q))
+        else:
+            out.writerow((q.item, q.gst, q.rate, q.discount, q.final, ""))
+    return buf.getvalue(), len(rows)
@@ -0,0 +1,71 @@
+# processor.py
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Run updates concurrently, but one at a time per user and per chat.
+
+    A customer's address -> photo -> price steps (and an admin's taps)
+    still apply in the order they arrived, while different users no
+    longer wait behind each other's slow API calls. Locks are created on
+    demand and dropped once nobody is waiting on them.
+
+    The concurrency limit is taken only once an update holds its locks.
+    PTB's own semaphore is acquired before do_process_update, so with it
+    a burst from one user would fill every slot with updates that just
+    wait on each other; it is therefore set too high to ever bind.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(2**30)
+        self.slots = asyncio.Semaphore(max_concurrent_updates)
+        self.locks = {}       # ("user"|"chat", id) -> [asyncio.Lock, users]
+
+    @staticmethod
+    def _keys(update):
+        keys = set()
+        user = getattr(update, "effective_user", None)
+        chat = getattr(update, "effective_chat", None)
+        if user is not None:
+            keys.add(("user", user.id))
+        if chat is not None and (user is None or chat.id != user.id):
+            keys.add(("chat", chat.id))
+        # Fixed order so two updates never wait on each other's second lock
+        return sorted(keys)
+
+    def _checkout(self, key):
+        entry = self.locks.get(key)
+        if entry is None:
+            entry = self.locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _checkin(self, key):
+        entry = self.locks[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        keys = self._keys(update)
+        locks = [self._checkout(key) for key in keys]
+        held = []
+        try:
+            for lock in locks:
+                await lock.acquire()
+                held.append(lock)
+            async with self.slots:
+                await coroutine
+        finally:
+            for lock in held:
+                lock.release()
+            for key in keys:
+                self._checkin(key)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,57 @@
+# profiles.py
+import time
+from collections import OrderedDict
+
+from config import PROFILE_CACHE_SIZE, PROFILE_TTL
+
+
+class ProfileCache:
+    """Recently seen users' display names, LRU-bounded with a TTL.
+
+    Filled from update.effective_user on every update, so by the time a
+    customer finishes an order their name is already here and placing it
+    needs no get_chat round-trip.
+    """
+
+    def __init__(self, maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()   # User ID -> (full_name, seen_at)
+        self.hits = 0
+        self.misses = 0
+
+    def remember(self, user):
+        self._put(user.id, user.full_name)
+
+    def _put(self, uid, name):
+        self.entries[uid] = (name, time.monotonic())
+        self.entries.move_to_end(uid)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get(self, uid):
+        entry = self.entries.get(uid)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(uid)
+        return entry[0]
+
+    async def full_name(self, bot, uid):
+        """Cached name, falling back to get_chat on a miss"""
+        name = self.get(uid)
+        if name is None:
+            chat = await bot.get_chat(uid)
+            name = chat.full_name
+            self._put(uid, name)
+        return name
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
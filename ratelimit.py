@@ -0,0 +1,71 @@
+# ratelimit.py
+# Per-user limits on incoming updates, checked before any handler runs so
+# a flood costs a bucket lookup instead of a trip through the pipeline.
+import time
+from collections import OrderedDict
+
+from config import RATE_LIMITS, RATE_LIMIT_USERS, RATE_LIMIT_WARN
+from outbox import TokenBucket
+
+
+def parse_limits(spec):
+    """"customer:1:20,admin:5:30" -> {"customer": (1.0, 20), "admin": (5.0, 30)}"""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        role, rate, burst = part.split(":")
+        if float(rate) > 0:
+            limits[role] = (float(rate), int(burst))
+    return limits
+
+
+class Limited:
+    __slots__ = ("role", "bucket", "warned")
+
+    def __init__(self, role, bucket):
+        self.role = role
+        self.bucket = bucket
+        self.warned = None   # When the user was last told to slow down
+
+
+class UpdateLimiter:
+    """A token bucket per user, with rate and burst set by their role.
+
+    Roles without a limit keep no state at all. Buckets are LRU-bounded;
+    a flooding user is always the most recent one, so eviction only ever
+    forgets idle users, whose buckets would have refilled anyway. A
+    rejected update may come with one "slow down" notice per warn_interval.
+    """
+
+    def __init__(self, limits=RATE_LIMITS, maxsize=RATE_LIMIT_USERS,
+                 warn_interval=RATE_LIMIT_WARN):
+        self.limits = parse_limits(limits)
+        self.maxsize = maxsize
+        self.warn_interval = warn_interval
+        self.users = OrderedDict()   # User ID -> Limited
+
+    def __len__(self):
+        return len(self.users)
+
+    def allow(self, uid, role, now=None):
+        """(allowed, warn); warn is True when the sender should be told"""
+        limit = self.limits.get(role)
+        if limit is None:
+            return True, False
+        now = time.monotonic() if now is None else now
+
+        entry = self.users.get(uid)
+        if entry is None or entry.role != role:
+            # New user, or promoted/demoted since their bucket was made
+            entry = self.users[uid] = Limited(role, TokenBucket(*limit))
+            if len(self.users) > self.maxsize:
+                self.users.popitem(last=False)
+        self.users.move_to_end(uid)
+
+        if entry.bucket.wait_time(now) == 0:
+            entry.bucket.take()
+            return True, False
+
+        if entry.warned is not None and now - entry.warned < self.warn_interval:
+            return False, False
+        entry.warned = now
+        return False, True
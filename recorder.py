@@ -0,0 +1,164 @@
+# recorder.py
+# Captures the incoming update stream to a gzip JSONL file for replay.py.
+# Users are pseudonymised with a keyed hash and free text is masked, so
+# a recording can leave the production box.
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import RECORD_PATH, RECORD_SALT
+
+ID_PARENTS = {"from", "chat", "user", "sender_chat", "forward_from",
+              "new_chat_members", "left_chat_member"}
+NAME_KEYS = {"first_name", "last_name", "username", "title"}
+FILE_KEYS = {"file_id", "file_unique_id"}
+DROP_KEYS = {"phone_number", "contact", "location", "venue", "url"}
+AMOUNT = re.compile(r"^\d{1,6}(\.\d+)?$")
+NOTED_EVENTS = {"placed": "customer", "assigned": "admin"}
+
+
+class UpdateRecorder:
+    """Appends every update, anonymised, to RECORD_PATH.
+
+    Free text is kept only when the bot routes on it (keyboard buttons,
+    commands, amounts); everything else becomes x's of the same length.
+    Numbers typed while in an ID-taking state (adding/removing an admin)
+    are pseudonymised like every other ID, so the replay stays consistent.
+    """
+
+    def __init__(self, path=RECORD_PATH, salt=RECORD_SALT):
+        self.path = path          # strftime pattern, one file per run
+        # Without a configured key every recording gets its own random one,
+        # so IDs can't be matched across recordings or hashed back
+        self.key = salt.encode() if salt else secrets.token_bytes(32)
+        self.keep_texts = set()
+        self.id_states = set()
+        self.started = None
+        self.file = None
+        self.batch = []
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="recorder"
+        )
+
+    def pseudo(self, value):
+        digest = hmac.new(self.key, str(value).encode(), hashlib.sha256).digest()
+        return 10**9 + int.from_bytes(digest[:4], "big")
+
+    def open(self, admins, keep_texts=(), id_states=()):
+        """Start a recording; admins (ID -> info) seeds the replay's ADMINS"""
+        self.started = time.time()
+        self.path = time.strftime(self.path, time.localtime(self.started))
+        self.keep_texts = set(keep_texts)
+        self.id_states = set(id_states)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        header = {
+            "type": "header",
+            "started": self.started,
+            "admins": {
+                str(self.pseudo(aid)): info for aid, info in admins.items()
+            },
+        }
+        self._write([json.dumps(header)])
+
+    # ---------- capture ----------
+    async def record(self, update, context):
+        user_data = context.user_data if update.effective_user else None
+        ids = bool(user_data) and user_data.get("state") in self.id_states
+        line = json.dumps({
+            "t": round(time.time() - self.started, 3),
+            "u": self.scrub(update.to_dict(), ids=ids),
+        }, ensure_ascii=False)
+        self.batch.append(line)
+        if len(self.batch) >= 200:
+            await self.flush()
+
+    def observe(self, entry):
+        """Journal listener: note who each token went to, so replay.py can
+        line recorded button presses up with the orders it places"""
+        who = NOTED_EVENTS.get(entry["event"])
+        if who is None:
+            return
+        self.batch.append(json.dumps({
+            "t": round(time.time() - self.started, 3),
+            "note": entry["event"],
+            "token": entry["token"],
+            "round": entry.get("round", 0),
+            who: self.pseudo(entry[who]),
+        }))
+
+    async def flush(self):
+        batch, self.batch = self.batch, []
+        if batch:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._write, batch)
+
+    async def close(self):
+        await self.flush()
+        if self.file:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self.file.close)
+            self.file = None
+
+    def _write(self, lines):
+        if self.file is None:
+            self.file = gzip.open(self.path, "at", encoding="utf-8")
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+
+    # ---------- anonymising ----------
+    def scrub(self, obj, parent=None, ids=False):
+        if isinstance(obj, list):
+            return [self.scrub(v, parent, ids) for v in obj]
+        if not isinstance(obj, dict):
+            return obj
+        out = {}
+        for key, value in obj.items():
+            if key in DROP_KEYS:
+                continue
+            if key == "id" and parent in ID_PARENTS:
+                out[key] = self.pseudo(value)
+            elif key in NAME_KEYS:
+                out[key] = "User" if key == "first_name" else None
+            elif key in FILE_KEYS:
+                out[key] = f"file-{self.pseudo(value)}"
+            elif key in ("text", "caption", "query") and isinstance(value, str):
+                out[key] = self.scrub_text(value, ids)
+            else:
+                out[key] = self.scrub(value, key, ids)
+        return {k: v for k, v in out.items() if v is not None}
+
+    def scrub_text(self, text, ids=False):
+        stripped = text.strip()
+        if stripped in self.keep_texts or stripped.startswith("/"):
+            return text
+        if ids and stripped.isdecimal():
+            return str(self.pseudo(int(stripped)))
+        if AMOUNT.match(stripped):
+            return text
+        return "x" * len(text)
+
+
+def read(path):
+    """(header, iterator of (offset seconds, entry dict)).
+
+    Entries are {"u": update} or a journal note
+    {"note": "placed" | "assigned", "token", "round", "customer" | "admin"}.
+    """
+    f = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(f.readline())
+
+    def entries():
+        with f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry.pop("t"), entry
+
+    return header, entries()
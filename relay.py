@@ -0,0 +1,106 @@
+# relay.py
+import asyncio
+
+from telegram import (
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+)
+
+from config import RELAY_ALBUM_WINDOW
+from outbox import PRIORITY_RELAY
+
+
+def album_item(message):
+    """InputMedia for one part of an album, or None if albums can't hold it"""
+    caption = {"caption": message.caption,
+               "caption_entities": message.caption_entities or None}
+    if message.photo:
+        return InputMediaPhoto(message.photo[-1].file_id, **caption)
+    if message.video:
+        return InputMediaVideo(message.video.file_id, **caption)
+    if message.document:
+        return InputMediaDocument(message.document.file_id, **caption)
+    if message.audio:
+        return InputMediaAudio(message.audio.file_id, **caption)
+    return None
+
+
+class ChatRelay:
+    """Carries chat-tunnel messages to the other side.
+
+    Each message is copied server-side with copy_message, so every type
+    (voice, location, documents, stickers...) goes through, nothing is
+    re-uploaded and the sender's formatting travels as entities instead
+    of being re-parsed as Markdown. Who is talking is said once, in a
+    header ahead of the first copy, and again only when the sender's
+    peer or order changes. Album parts arrive as separate updates; they
+    are held until none has come for RELAY_ALBUM_WINDOW seconds and go
+    on as one album.
+    """
+
+    def __init__(self, outbox, window=RELAY_ALBUM_WINDOW):
+        self.outbox = outbox
+        self.window = window
+        self.headed = {}   # Sender ID -> (recipient ID, header) last sent
+        self.albums = {}   # (sender ID, media_group_id) -> (recipient ID, header, [messages])
+        self.timers = {}   # Same key -> flush task
+
+    def relay(self, sender, message, recipient_id, header):
+        if message.media_group_id:
+            key = (sender, message.media_group_id)
+            album = self.albums.setdefault(key, (recipient_id, header, []))
+            album[2].append(message)
+            self._schedule(key, 0 if len(album[2]) >= 10 else self.window)
+            return
+        self._announce(sender, recipient_id, header)
+        self._copy(sender, recipient_id, message)
+
+    def forget(self, sender):
+        """The sender's chat is over; the next one gets a fresh header"""
+        self.headed.pop(sender, None)
+
+    def __len__(self):
+        return len(self.headed)
+
+    # ---------- sending ----------
+    def _announce(self, sender, recipient_id, header):
+        if self.headed.get(sender) == (recipient_id, header):
+            return
+        self.headed[sender] = (recipient_id, header)
+        self.outbox.send_message(recipient_id, header, priority=PRIORITY_RELAY)
+
+    def _copy(self, sender, recipient_id, message):
+        self.outbox.send(
+            PRIORITY_RELAY, "copy_message", recipient_id,
+            from_chat_id=sender, message_id=message.message_id
+        )
+
+    def _schedule(self, key, delay):
+        timer = self.timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self.timers[key] = asyncio.create_task(self._flush_after(key, delay))
+
+    async def _flush_after(self, key, delay):
+        await asyncio.sleep(delay)
+        self.timers.pop(key, None)
+        recipient_id, header, parts = self.albums.pop(key)
+        sender = key[0]
+        parts.sort(key=lambda m: m.message_id)
+        self._announce(sender, recipient_id, header)
+        media = [album_item(m) for m in parts]
+        if len(media) < 2 or None in media:
+            for message in parts:
+                self._copy(sender, recipient_id, message)
+            return
+        self.outbox.send(
+            PRIORITY_RELAY, "send_media_group", recipient_id, media=media
+        )
+
+    async def stop(self):
+        """Send albums still waiting for their last part"""
+        for key in list(self.timers):
+            self._schedule(key, 0)
+        await asyncio.gather(*self.timers.values(), return_exceptions=True)
@@ -0,0 +1,257 @@
+# replay.py
+# Feeds a recorder.py capture back through the bot against loadtest.py's
+# FakeBotAPI and reports handler latency, outbound calls and memory growth.
+#   python replay.py recordings/updates-20240101T120000.jsonl.gz [--speed 10|max]
+#
+# Compare two revisions by replaying the same file on each.
+import argparse
+import asyncio
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from loadtest import FakeBotAPI, percentile, timed_handlers
+
+# Allocations made by the harness itself, not the bot
+HARNESS_FILES = ("loadtest.py", "httpd.py", "replay.py", "recorder.py", "tracemalloc")
+TOKEN_BUTTON = re.compile(r"^([a-z]+)_(\d+)$")
+
+
+class TokenMap:
+    """Lines the recording's orders up with the ones this replay places.
+
+    Tokens and least-loaded picks depend on timing, so they differ from
+    run to run. The recording notes each customer's orders in sequence
+    and who every round went to; the n-th order of a customer here is
+    matched to the n-th there, its assignment is steered to the recorded
+    admin, and tokens in recorded button presses are rewritten to match.
+    """
+
+    def __init__(self, notes, steer):
+        self.steer = steer                 # (token, admin) -> None
+        self.recorded = {}                 # Recorded token -> (customer, n)
+        self.orders = {}                   # (customer, n) -> recorded token
+        self.admins = {}                   # (recorded token, round) -> admin
+        self.replayed = defaultdict(list)  # Customer -> tokens from the replay
+        self.to_recorded = {}              # Replay token -> recorded token
+        self.changed = asyncio.Event()
+
+        counts = defaultdict(int)
+        for note in notes:
+            token = note["token"]
+            if note["note"] == "placed":
+                key = (note["customer"], counts[note["customer"]])
+                counts[note["customer"]] += 1
+                self.recorded[token] = key
+                self.orders[key] = token
+            else:
+                self.admins[(token, note["round"])] = note["admin"]
+
+    def observe(self, entry):
+        """Journal listener on the replayed bot"""
+        token = entry["token"]
+        if entry["event"] == "placed":
+            tokens = self.replayed[entry["customer"]]
+            tokens.append(token)
+            recorded = self.orders.get((entry["customer"], len(tokens) - 1))
+            if recorded is not None:
+                self.to_recorded[token] = recorded
+            self.changed.set()
+        elif entry["event"] == "assigned":
+            key = (self.to_recorded.get(token), entry["round"])
+            admin = self.admins.get(key)
+            if admin is not None and admin != entry["admin"]:
+                self.steer(token, admin)
+                entry["admin"] = admin
+
+    async def translate(self, update, timeout=5):
+        query = update.get("callback_query")
+        match = TOKEN_BUTTON.match(query.get("data", "")) if query else None
+        if not match or int(match[2]) not in self.recorded:
+            return
+        customer, n = self.recorded[int(match[2])]
+        deadline = time.perf_counter() + timeout
+        while len(self.replayed[customer]) <= n:
+            self.changed.clear()
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                return             # Never placed in this replay; send as recorded
+            try:
+                await asyncio.wait_for(self.changed.wait(), left)
+            except asyncio.TimeoutError:
+                return
+        query["data"] = f"{match[1]}_{self.replayed[customer][n]}"
+
+
+async def feed(api, entries, speed, tokens):
+    """Push recorded updates at `speed` times real time (0 = no waiting)"""
+    start = time.perf_counter()
+    count = 0
+    for offset, entry in entries:
+        if "note" in entry:
+            continue
+        update = entry["u"]
+        await tokens.translate(update)
+        if speed:
+            delay = start + offset / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            # Flat out, but don't let the fake server buffer the whole file
+            while len(api.updates) > 500:
+                await asyncio.sleep(0.01)
+        api.push_update(update)
+        count += 1
+    return count
+
+
+async def drained(api, app, outbox, quiet=0.5):
+    """Wait until nothing is queued and no API call happened for `quiet` s"""
+    last, still = None, time.perf_counter()
+    while True:
+        calls = sum(n for m, n in api.calls.items() if m != "getUpdates")
+        busy = api.updates or not app.update_queue.empty() or outbox.depth()
+        if busy or calls != last:
+            last, still = calls, time.perf_counter()
+        elif time.perf_counter() - still > quiet:
+            return
+        await asyncio.sleep(0.05)
+
+
+def report(count, took, api, timings, rss, growth):
+    ms = lambda s: f"{s * 1000:8.1f} ms"
+    outbound = {m: n for m, n in api.calls.items()
+                if m not in ("getUpdates", "getMe")}
+
+    print(f"\n🔁 Replayed {count} updates in {took:.1f}s ({count / took:.1f} updates/sec)")
+
+    print("\n🧩 Handler latency        p50         p95         p99      calls")
+    for name, values in sorted(timings.items()):
+        print(f"   {name:<18}" + "".join(
+            f"{ms(percentile(values, p)):>12}" for p in (50, 95, 99)
+        ) + f"{len(values):>11}")
+
+    per = max(count, 1)
+    print(f"\n📡 Outbound API calls per update: {sum(outbound.values()) / per:.2f}")
+    for method, n in sorted(outbound.items(), key=lambda kv: -kv[1]):
+        print(f"   {method:<24}{n:>8}  ({n / per:.3f}/update)")
+
+    print(f"\n🧠 RSS {rss[0] / 2**20:.1f} MB → {rss[1] / 2**20:.1f} MB "
+          f"({(rss[1] - rss[0]) / 2**20:+.1f} MB)")
+    if growth is not None:
+        total, top = growth
+        print(f"   Python heap growth: {total / 1024:+.1f} KB")
+        for stat in top:
+            frame = stat.traceback[0]
+            print(f"   {stat.size_diff / 1024:+9.1f} KB  "
+                  f"{os.path.basename(frame.filename)}:{frame.lineno}")
+
+
+async def main(args):
+    api = FakeBotAPI(latency=args.latency / 1000, deliver=False)
+    os.environ["BOT_API_URL"] = await api.start()
+
+    # Imported late: config is read from the environment at import time
+    from recorder import read
+    header, entries = read(args.path)
+    main_admin = next(
+        (aid for aid, info in header["admins"].items() if info.get("role") == "main"),
+        "1"
+    )
+    # recorder has already pulled in config, so set it there as well
+    import config
+    os.environ["MAIN_ADMIN_ID"] = main_admin
+    config.MAIN_ADMIN_ID = int(main_admin)
+    import bot
+    import metrics
+
+    for aid, info in header["admins"].items():
+        bot.ADMINS[int(aid)] = info
+
+    # At full speed an order can be placed before the recorded admin's
+    # "Online" tap has been handled; follow the recording regardless
+    def steer(token, admin):
+        order = bot.active_orders.get(token)
+        if order is None:
+            return
+        bot.admin_pool.release(order["assigned_admin"])
+        bot.admin_pool.add_load(admin)
+        order["assigned_admin"] = admin
+
+    # First pass picks up the notes so every order can be matched up front
+    _, first_pass = read(args.path)
+    notes = [entry for _, entry in first_pass if "note" in entry]
+    tokens = TokenMap(notes, steer)
+    bot.journal.listeners.append(tokens.observe)
+
+    app = bot.build_app()
+    timings = defaultdict(list)
+    timed_handlers(app, timings)
+
+    await app.initialize()
+    await app.post_init(app)
+    await app.updater.start_polling(poll_interval=0, timeout=1)
+    await app.start()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+    rss_before = metrics.resident_bytes()
+
+    start = time.perf_counter()
+    count = await feed(api, entries, args.speed, tokens)
+    await drained(api, app, bot.outbox)
+    took = time.perf_counter() - start
+
+    rss_after = metrics.resident_bytes()
+    growth = None
+    if args.tracemalloc:
+        after = tracemalloc.take_snapshot()
+        keep = [tracemalloc.Filter(False, f"*{name}*") for name in HARNESS_FILES]
+        stats = after.filter_traces(keep).compare_to(before.filter_traces(keep), "lineno")
+        growth = (sum(s.size_diff for s in stats), stats[:args.top])
+        tracemalloc.stop()
+
+    await app.updater.stop()
+    await app.stop()
+    await app.post_shutdown(app)
+    await app.shutdown()
+    await api.stop()
+
+    report(count, took, api, timings, (rss_before, rss_after), growth)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="recording from RECORD_PATH")
+    parser.add_argument("--speed", default="1",
+                        help="1 = real time, 10 = ten times faster, max = no waiting")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="milliseconds the fake API takes per call")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report where Python heap growth comes from (slower)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    args.speed = 0 if args.speed == "max" else float(args.speed)
+
+    tmp = tempfile.mkdtemp(prefix="replay-")
+    os.environ.setdefault("BOT_TOKEN", "123456:replay")
+    # config needs one to import; main() swaps in the recording's main admin
+    os.environ.setdefault("MAIN_ADMIN_ID", "0")
+    os.environ["DB_PATH"] = os.path.join(tmp, "orders.db")
+    os.environ["STATE_DB_PATH"] = os.path.join(tmp, "state.db")
+    os.environ["JOURNAL_DIR"] = os.path.join(tmp, "journal")
+    os.environ["TRANSCRIPT_DIR"] = os.path.join(tmp, "transcripts")
+    os.environ["RECORD_PATH"] = ""
+    os.environ.setdefault("METRICS_PORT", "0")
+    # Replay measures the bot, not Telegram's rate limits
+    os.environ.setdefault("OUTBOX_GLOBAL_RATE", "100000")
+    os.environ.setdefault("OUTBOX_CHAT_RATE", "100000")
+    os.environ.setdefault("OUTBOX_CHAT_BURST", "100000")
+    # Nor per-user limits, which a sped-up replay would trip
+    os.environ.setdefault("RATE_LIMITS", "")
+
+    asyncio.run(main(args))
@@ -0,0 +1,85 @@
+# scheduler.py
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class DeadlineScheduler:
+    """All order deadlines in one heap, served by a single task.
+
+    Deadlines are wall-clock timestamps so they can be stored with the
+    order and scheduled again after a restart. cancel() only marks the
+    heap entry dead (O(1)); dead entries are skipped when they surface.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback  # async callback(key)
+        self.heap = []
+        self.entries = {}         # Key -> [when, seq, key, alive]
+        self.seq = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def schedule(self, key, when):
+        """Fire callback(key) at unix time `when`, replacing any earlier deadline"""
+        self.cancel(key)
+        entry = [when, next(self.seq), key, True]
+        self.entries[key] = entry
+        heapq.heappush(self.heap, entry)
+        if self.heap[0] is entry:
+            self.wakeup.set()
+
+    def cancel(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            entry[3] = False
+            self.dead += 1
+            if self.dead > 64 and self.dead > len(self.heap) // 2:
+                self._compact()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def _compact(self):
+        self.heap = [e for e in self.heap if e[3]]
+        heapq.heapify(self.heap)
+        self.dead = 0
+
+    async def _run(self):
+        while True:
+            while self.heap and not self.heap[0][3]:
+                heapq.heappop(self.heap)
+                self.dead -= 1
+
+            self.wakeup.clear()
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+
+            delay = self.heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            when, _, key, _ = heapq.heappop(self.heap)
+            del self.entries[key]
+            try:
+                await self.callback(key)
+            except Exception as e:
+                print(f"⚠️ Deadline callback failed for {key}: {e}")
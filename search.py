@@ -0,0 +1,180 @@
+# search.py
+# Order search for the admins' inline queries (@bot <query>).
+import re
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+
+from config import SEARCH_RECENT
+
+WORD = re.compile(r"[^\W_]+")   # Runs of letters/digits, any script
+EMPTY = array("I")
+
+
+def words(text):
+    return WORD.findall(str(text).casefold())
+
+
+def _keys(word):
+    # "^a", "^ab" for short queries, trigrams for everything longer
+    keys = {"^" + word[:1], "^" + word[:2]}
+    keys.update(word[i:i + 3] for i in range(len(word) - 2))
+    return keys
+
+
+def _term_keys(term):
+    if len(term) < 3:
+        return ["^" + term]
+    return [term[i:i + 3] for i in range(len(term) - 2)]
+
+
+def _has(posting, token):
+    i = bisect_left(posting, token)
+    return i < len(posting) and posting[i] == token
+
+
+class Entry:
+    __slots__ = ("text", "admin", "order")
+
+    def __init__(self, text, admin, order):
+        self.text = text      # " word word ..." of every searchable field
+        self.admin = admin    # Whose by_admin array the token was last put in
+        self.order = order    # The live dict, so status is always current
+
+    def matches(self, term):
+        # Short terms only match the start of a word, like their index keys
+        return (" " + term if len(term) < 3 else term) in self.text
+
+
+class OrderIndex:
+    """Token, customer name, address and UPI of live and recent orders.
+
+    Every word contributes its trigrams plus one- and two-letter prefix
+    keys; each key maps to a sorted array of tokens. Tokens only grow, so
+    indexing a new order is an append per key, and a query walks its
+    rarest key's array from the newest end, checking the other keys by
+    bisection, until it has enough hits. Finished orders stay findable
+    until SEARCH_RECENT newer ones have finished. Removed tokens are left
+    in the arrays and skipped, until they outnumber live ones and the
+    arrays are rebuilt.
+    """
+
+    def __init__(self, keep_recent=SEARCH_RECENT):
+        self.keep_recent = keep_recent
+        self.postings = {}     # Key -> array of tokens, ascending
+        self.by_admin = {}     # Admin ID -> array of tokens, ascending
+        self.tokens = array("I")
+        self.entries = {}      # Token -> Entry
+        self.recent = deque()  # Finished tokens, oldest first
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, token):
+        return token in self.entries
+
+    # ---------- updates ----------
+    def add(self, token, order):
+        """Index an order, or refresh its status and admin if already there"""
+        admin = order.get("assigned_admin")
+        entry = self.entries.get(token)
+        if entry is not None:
+            entry.order = order
+            if admin != entry.admin:
+                entry.admin = admin
+                self._post(self.by_admin.setdefault(admin, array("I")), token)
+            return
+
+        cust = order["customer"]
+        found = words(token)
+        for field in ("name", "address", "upi"):
+            if cust.get(field):
+                found.extend(words(cust[field]))
+        self.entries[token] = Entry(" " + " ".join(found), admin, order)
+        keys = set()
+        for word in found:
+            keys.update(_keys(word))
+        for key in keys:
+            self._post(self.postings.setdefault(key, array("I")), token)
+        self._post(self.by_admin.setdefault(admin, array("I")), token)
+        self._post(self.tokens, token)
+
+    def retire(self, token):
+        """The order finished; keep it searchable as a recent one"""
+        if token not in self.entries:
+            return
+        self.recent.append(token)
+        while len(self.recent) > self.keep_recent:
+            self.remove(self.recent.popleft())
+
+    def remove(self, token):
+        if self.entries.pop(token, None) is not None:
+            self.dead += 1
+            if self.dead > 1024 and self.dead > len(self.entries):
+                self._compact()
+
+    def _post(self, posting, token):
+        if not posting or posting[-1] < token:
+            posting.append(token)
+        elif not _has(posting, token):
+            insort(posting, token)    # Restored or fetched out of order
+
+    def _compact(self):
+        live = self.entries
+
+        def keep(posting):
+            return array("I", (t for t in posting if t in live))
+
+        self.postings = {k: p for k, p in (
+            (k, keep(p)) for k, p in self.postings.items()) if p}
+        self.by_admin = {a: p for a, p in (
+            (a, keep(p)) for a, p in self.by_admin.items()) if p}
+        self.tokens = keep(self.tokens)
+        self.dead = 0
+
+    # ---------- queries ----------
+    def search(self, query, limit=20, admin=None):
+        """Newest matching tokens; every query word must match. Orders
+        assigned to someone else are left out when `admin` is given."""
+        terms = words(query)
+        lists = []
+        for term in terms:
+            lists.append(min(
+                (self.postings.get(k, EMPTY) for k in _term_keys(term)), key=len
+            ))
+        if admin is not None:
+            lists.append(self.by_admin.get(admin, EMPTY))
+        if not lists:
+            lists.append(self.tokens)
+        lists.sort(key=len)
+        driver, others = lists[0], lists[1:]
+
+        hits = []
+        exact = int(terms[0]) if len(terms) == 1 and terms[0].isdecimal() else None
+        if exact in self.entries and self._allowed(exact, admin):
+            hits.append(exact)        # A token typed in full comes first
+
+        last = None
+        for i in range(len(driver) - 1, -1, -1):
+            if len(hits) >= limit:
+                break
+            token = driver[i]
+            if token == last or token == exact:
+                continue
+            last = token
+            entry = self.entries.get(token)
+            if entry is None or not self._allowed(token, admin):
+                continue
+            if all(_has(p, token) for p in others) and all(
+                entry.matches(t) for t in terms
+            ):
+                hits.append(token)
+        return hits
+
+    def _allowed(self, token, admin):
+        return admin is None or self.entries[token].admin == admin
+
+    def get(self, token):
+        entry = self.entries.get(token)
+        return entry.order if entry else None
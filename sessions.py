@@ -0,0 +1,94 @@
+# sessions.py
+import asyncio
+import time
+
+from config import SESSION_SWEEP_INTERVAL
+
+
+class Sweeper:
+    """One background task that expires idle sessions everywhere.
+
+    Each registered sweep(app, now) evicts whatever it owns that has gone
+    stale and returns how many entries it dropped. Activity is tracked
+    here with touch(), so the session maps themselves keep their plain
+    key -> value shape.
+    """
+
+    def __init__(self, interval=SESSION_SWEEP_INTERVAL):
+        self.interval = interval
+        self.sweeps = {}          # Name -> async sweep(app, now) -> evicted
+        self.sizes = {}           # Name -> () -> entries held
+        self.seen = {}            # (kind, key) -> last activity (wall clock)
+        self.evicted = {}         # Name -> total evicted
+        self.app = None
+        self.task = None
+
+    def sweep(self, name):
+        def register(fn):
+            self.sweeps[name] = fn
+            return fn
+        return register
+
+    def measure(self, name, size):
+        self.sizes[name] = size
+
+    # ---------- activity ----------
+    def touch(self, kind, key):
+        self.seen[(kind, key)] = time.time()
+
+    def forget(self, kind, key):
+        self.seen.pop((kind, key), None)
+
+    def idle(self, kind, key, now):
+        """Seconds since the last touch; the clock starts at the first sweep
+        that sees an entry nobody touched (e.g. after a restart)"""
+        return now - self.seen.setdefault((kind, key), now)
+
+    def idle_keys(self, kind, ttl, now):
+        return [
+            key for (k, key), at in list(self.seen.items())
+            if k == kind and now - at > ttl
+        ]
+
+    # ---------- accounting ----------
+    def usage(self):
+        usage = {name: size() for name, size in self.sizes.items()}
+        usage["activity"] = len(self.seen)
+        return usage
+
+    # ---------- lifecycle ----------
+    async def run_once(self):
+        now = time.time()
+        swept = {}
+        for name, fn in self.sweeps.items():
+            try:
+                n = await fn(self.app, now)
+            except Exception as e:
+                print(f"⚠️ Session sweep '{name}' failed: {e}")
+                continue
+            if n:
+                swept[name] = n
+                self.evicted[name] = self.evicted.get(name, 0) + n
+        if swept:
+            done = ", ".join(f"{name} {n}" for name, n in swept.items())
+            held = ", ".join(f"{name} {n}" for name, n in self.usage().items())
+            print(f"🧹 Expired {done} (holding {held})")
+        return swept
+
+    def start(self, app):
+        self.app = app
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
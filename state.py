@@ -0,0 +1,430 @@
+# state.py
+# Shared state behind ADMINS, tracking_wait, CHAT_SESSIONS and USER_TOKENS.
+# "memory" keeps everything in this process; "sqlite" keeps it in a WAL
+# database file so several bot workers on one host see the same state.
+import asyncio
+import json
+import sqlite3
+import time
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    STATE_BACKEND,
+    STATE_DB_PATH,
+    CLAIM_TTL,
+    STATE_MIRROR_INTERVAL,
+    STATE_RETRY_INTERVAL,
+)
+from writer import BatchWriter
+
+
+class StateBackend:
+    """Namespaced key/value store plus first-writer-wins claims.
+
+    Keys and values must be JSON-serialisable. claim() is the only
+    operation that has to be atomic across workers: the first owner to
+    claim a name keeps it, everyone else gets False.
+    """
+
+    def get(self, ns, key, default=None):
+        raise NotImplementedError
+
+    def set(self, ns, key, value):
+        raise NotImplementedError
+
+    def delete(self, ns, key):
+        """Remove key; returns True if it existed"""
+        raise NotImplementedError
+
+    def keys(self, ns):
+        raise NotImplementedError
+
+    def count(self, ns):
+        raise NotImplementedError
+
+    def version(self, ns):
+        """Changes whenever anything in the namespace is written"""
+        raise NotImplementedError
+
+    async def claim(self, name, owner):
+        """True if `owner` holds `name` (newly or already)"""
+        raise NotImplementedError
+
+    async def claim_owner(self, name):
+        raise NotImplementedError
+
+    def mirror(self, ns):
+        """Serve reads of `ns` from a local copy; no-op where reads are local"""
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class MemoryBackend(StateBackend):
+    def __init__(self):
+        self.data = {}        # ns -> {key: value}
+        self.versions = {}
+        self.claims = {}      # name -> (owner, claimed_at)
+        self.claimed = 0
+
+    def _ns(self, ns):
+        return self.data.setdefault(ns, {})
+
+    def get(self, ns, key, default=None):
+        return self._ns(ns).get(key, default)
+
+    def set(self, ns, key, value):
+        self._ns(ns)[key] = value
+        self.versions[ns] = self.versions.get(ns, 0) + 1
+
+    def delete(self, ns, key):
+        found = self._ns(ns).pop(key, None) is not None
+        if found:
+            self.versions[ns] = self.versions.get(ns, 0) + 1
+        return found
+
+    def keys(self, ns):
+        return list(self._ns(ns))
+
+    def count(self, ns):
+        return len(self._ns(ns))
+
+    def version(self, ns):
+        return self.versions.get(ns, 0)
+
+    async def claim(self, name, owner):
+        now = time.time()
+        held = self.claims.get(name)
+        if held is None:
+            self.claims[name] = (owner, now)
+            self.claimed += 1
+            if self.claimed % 1000 == 0:
+                self.claims = {
+                    n: c for n, c in self.claims.items()
+                    if now - c[1] < CLAIM_TTL
+                }
+            return True
+        return held[0] == owner
+
+    async def claim_owner(self, name):
+        held = self.claims.get(name)
+        return held[0] if held else None
+
+
+class SQLiteBackend(StateBackend):
+    """State in a WAL database shared by the workers on one host.
+
+    Namespaces read on every update (roles, who is in a chat) can be
+    mirrored: reads come from an in-process copy, own writes change the
+    copy at once and reach the database through a writer thread, and a
+    follower thread reloads the copy when another worker changed the
+    namespace. Those changes show up here after up to
+    STATE_MIRROR_INTERVAL seconds. Claims also run on the writer thread,
+    so a worker holding the write lock never stalls this event loop.
+    """
+
+    def __init__(self, path=STATE_DB_PATH, interval=STATE_MIRROR_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.conn = None
+        self.claimed = 0
+        self.mirrors = {}     # ns -> {key: value as JSON}
+        self.seen = {}        # ns -> database version the mirror matches
+        self.floor = {}       # ns -> oldest version that has our own writes
+        self.changes = {}     # ns -> local version() of a mirrored namespace
+        self.pending = {}     # ns -> own changes not yet in the database
+        self.writer = BatchWriter(
+            self._commit, "State", "changes", done=self._committed,
+            retry=STATE_RETRY_INTERVAL,
+        )
+        self.reader = None    # Follower thread's own connection
+        self.follower = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="state-follower"
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _db(self):
+        if self.conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS kv (
+                ns TEXT,
+                key TEXT,
+                value TEXT,
+                PRIMARY KEY (ns, key)
+            )
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS kv_version (
+                ns TEXT PRIMARY KEY,
+                version INTEGER
+            )
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS claims (
+                name TEXT PRIMARY KEY,
+                owner TEXT,
+                claimed_at REAL
+            )
+            """)
+            self.conn = conn
+        return self.conn
+
+    def _bump(self, db, ns):
+        return db.execute(
+            "INSERT INTO kv_version (ns, version) VALUES (?, 1) "
+            "ON CONFLICT(ns) DO UPDATE SET version = version + 1 "
+            "RETURNING version",
+            (ns,)
+        ).fetchone()[0]
+
+    def get(self, ns, key, default=None):
+        mirror = self.mirrors.get(ns)
+        if mirror is not None:
+            value = mirror.get(key)
+            return default if value is None else json.loads(value)
+        row = self._db().execute(
+            "SELECT value FROM kv WHERE ns=? AND key=?", (ns, json.dumps(key))
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, ns, key, value):
+        value = json.dumps(value)
+        if ns in self.mirrors:
+            self.mirrors[ns][key] = value
+            self._queue(ns, key, value)
+        else:
+            self._commit([(ns, json.dumps(key), value)])
+
+    def delete(self, ns, key):
+        if ns in self.mirrors:
+            if self.mirrors[ns].pop(key, None) is None:
+                return False
+            self._queue(ns, key, None)
+            return True
+        return self._commit([(ns, json.dumps(key), None)])[ns][0] is not None
+
+    def keys(self, ns):
+        if ns in self.mirrors:
+            return list(self.mirrors[ns])
+        rows = self._db().execute("SELECT key FROM kv WHERE ns=?", (ns,))
+        return [json.loads(k) for (k,) in rows]
+
+    def count(self, ns):
+        if ns in self.mirrors:
+            return len(self.mirrors[ns])
+        return self._db().execute(
+            "SELECT COUNT(*) FROM kv WHERE ns=?", (ns,)
+        ).fetchone()[0]
+
+    def version(self, ns):
+        if ns in self.mirrors:
+            return self.changes[ns]
+        row = self._db().execute(
+            "SELECT version FROM kv_version WHERE ns=?", (ns,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    async def claim(self, name, owner):
+        return await self.writer.run(self._claim, name, owner)
+
+    async def claim_owner(self, name):
+        return await self.writer.run(self._claim_owner, name)
+
+    # ---------- writer thread ----------
+    def _commit(self, changes):
+        """Apply (ns, key JSON, value JSON or None to delete) changes in one
+        transaction; {ns: (new version or None if unchanged, changes)}"""
+        db = self._db()
+        done = {}
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            changed = set()
+            for ns, key, value in changes:
+                if value is None:
+                    cur = db.execute(
+                        "DELETE FROM kv WHERE ns=? AND key=?", (ns, key)
+                    )
+                else:
+                    cur = db.execute(
+                        "INSERT OR REPLACE INTO kv (ns, key, value) "
+                        "VALUES (?, ?, ?)",
+                        (ns, key, value)
+                    )
+                if cur.rowcount:
+                    changed.add(ns)
+                done[ns] = done.get(ns, 0) + 1
+            versions = {ns: self._bump(db, ns) for ns in changed}
+        return {ns: (versions.get(ns), n) for ns, n in done.items()}
+
+    def _claim(self, name, owner):
+        db = self._db()
+        owner = json.dumps(owner)
+        cur = db.execute(
+            "INSERT OR IGNORE INTO claims (name, owner, claimed_at) "
+            "VALUES (?, ?, ?)",
+            (name, owner, time.time())
+        )
+        if cur.rowcount:
+            self.claimed += 1
+            if self.claimed % 1000 == 0:
+                db.execute(
+                    "DELETE FROM claims WHERE claimed_at < ?",
+                    (time.time() - CLAIM_TTL,)
+                )
+            return True
+        return self._claim_owner(name) == json.loads(owner)
+
+    def _claim_owner(self, name):
+        row = self._db().execute(
+            "SELECT owner FROM claims WHERE name=?", (name,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ---------- mirrors ----------
+    def mirror(self, ns):
+        if ns in self.mirrors:
+            return
+        version, rows = self._snapshot(self._db(), ns)
+        self.mirrors[ns] = rows
+        self.seen[ns] = version
+        self.floor[ns] = version
+        self.changes[ns] = 0
+        self.pending[ns] = 0
+
+    def start(self):
+        self.writer.start()
+        if self.mirrors and self.follower is None:
+            self.follower = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        if self.follower:
+            self.follower.cancel()
+            self.follower = None
+        await self.writer.stop()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._close_reader)
+
+    def _queue(self, ns, key, value):
+        self.changes[ns] += 1
+        self.pending[ns] += 1
+        self.writer.put((ns, json.dumps(key), value))
+
+    def _committed(self, done):
+        for ns, (version, n) in done.items():
+            if ns not in self.mirrors:
+                continue
+            self.pending[ns] -= n
+            if version is None:
+                continue
+            self.floor[ns] = max(self.floor[ns], version)
+            if version == self.seen[ns] + 1:
+                self.seen[ns] = version     # Nobody else wrote in between
+            # Otherwise the follower reloads everything up to this version
+
+    async def _follow(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                fresh = await loop.run_in_executor(
+                    self.executor, self._changed, dict(self.seen)
+                )
+            except Exception as e:
+                print(f"⚠️ State mirror refresh failed: {e}")
+                continue
+            for ns, (version, rows) in fresh.items():
+                # A snapshot without our latest writes would undo them
+                if not self.pending[ns] and version >= self.floor[ns]:
+                    self.mirrors[ns] = rows
+                    self.seen[ns] = version
+                    self.changes[ns] += 1
+
+    # ---------- follower thread ----------
+    def _snapshot(self, db, ns):
+        db.execute("BEGIN")
+        try:
+            row = db.execute(
+                "SELECT version FROM kv_version WHERE ns=?", (ns,)
+            ).fetchone()
+            rows = db.execute(
+                "SELECT key, value FROM kv WHERE ns=?", (ns,)
+            ).fetchall()
+        finally:
+            db.execute("COMMIT")
+        return (row[0] if row else 0), {json.loads(k): v for k, v in rows}
+
+    def _changed(self, seen):
+        if self.reader is None:
+            self.reader = self._connect()
+        versions = dict(self.reader.execute(
+            "SELECT ns, version FROM kv_version"
+        ).fetchall())
+        return {
+            ns: self._snapshot(self.reader, ns)
+            for ns, version in seen.items()
+            if versions.get(ns, 0) != version
+        }
+
+    def _close_reader(self):
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+
+
+class SharedMap(MutableMapping):
+    """Dict view of one backend namespace"""
+
+    def __init__(self, backend, ns, mirrored=False):
+        self.backend = backend
+        self.ns = ns
+        if mirrored:
+            backend.mirror(ns)
+
+    def __getitem__(self, key):
+        value = self.backend.get(self.ns, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.backend.set(self.ns, key, value)
+
+    def __delitem__(self, key):
+        if not self.backend.delete(self.ns, key):
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.backend.keys(self.ns))
+
+    def __len__(self):
+        return self.backend.count(self.ns)
+
+    def __contains__(self, key):
+        return self.backend.get(self.ns, key, _MISSING) is not _MISSING
+
+    def version(self):
+        return self.backend.version(self.ns)
+
+
+_MISSING = object()
+
+
+def make_backend(kind=STATE_BACKEND):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend()
+    raise ValueError(f"Unknown STATE_BACKEND: {kind}")
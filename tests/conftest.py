@@ -0,0 +1,10 @@
+# config.py reads the environment at import time
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault("MAIN_ADMIN_ID", "1")
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "orders.db"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
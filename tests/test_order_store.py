@@ -0,0 +1,153 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import database
+from order_store import OrderStore
+
+
+def make_order(token, customer_id, status="pending"):
+    return {
+        "token": token,
+        "status": status,
+        "assigned_admin": 100,
+        "created_at": 1000.0,
+        "customer": {
+            "id": customer_id, "name": f"User{customer_id}", "address": "addr",
+            "image": "img", "final": 200, "payment": "cod", "upi": None,
+        },
+    }
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT id, token, user_id, status FROM orders ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OrderStore(str(tmp_path / "orders.db"))
+    yield store
+    if store.conn:
+        store.conn.close()
+
+
+@pytest.fixture
+def fail_once(monkeypatch):
+    """Make the next rollup write raise, rolling back its transaction"""
+    real = database.bump_rollups
+    state = {"armed": True}
+
+    def bump(*args, **kwargs):
+        if state["armed"]:
+            state["armed"] = False
+            raise sqlite3.OperationalError("database is locked")
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(database, "bump_rollups", bump)
+    return state
+
+
+def test_rolled_back_insert_does_not_keep_its_rowid(store, fail_once):
+    store.orders[1] = make_order(1, 10)
+    with pytest.raises(sqlite3.OperationalError):
+        store.save(1)
+    assert 1 not in store.rowids
+    assert 1 not in store.rolled
+
+    # Token 2 now gets the row ID token 1's insert had before the rollback
+    store.orders[2] = make_order(2, 11, "accepted")
+    store.save(2)
+    store.save(1)
+    store.orders[1]["status"] = "accepted"
+    store.save(1)
+
+    assert sorted(r[1:] for r in rows(store.path)) == [
+        (1, 10, "accepted"), (2, 11, "accepted"),
+    ]
+
+
+def test_rollups_count_an_order_once_after_a_failed_write(store, fail_once):
+    store.orders[1] = make_order(1, 10)
+    with pytest.raises(sqlite3.OperationalError):
+        store.save(1)
+    store.save(1)
+    store.save(1)
+
+    conn = sqlite3.connect(store.path)
+    try:
+        total = conn.execute("SELECT SUM(orders) FROM daily_rollup").fetchone()[0]
+    finally:
+        conn.close()
+    assert total == 1
+
+
+def test_writer_retries_a_failed_batch(store, fail_once):
+    store.writer.retry = 0.01
+
+    async def run():
+        await store.open()
+        store[1] = make_order(1, 10)
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if not store.writer.unwritten and rows(store.path):
+                break
+        # A newer snapshot queued after the failure must not be undone
+        store[1]["status"] = "accepted"
+        store.save(1)
+        await store.close()
+
+    asyncio.run(run())
+    assert not fail_once["armed"]
+    assert [r[1:] for r in rows(store.path)] == [(1, 10, "accepted")]
+
+
+def test_refresh_picks_up_other_workers_changes(tmp_path):
+    path = str(tmp_path / "orders.db")
+    here, there = OrderStore(path, shared=True), OrderStore(path, shared=True)
+
+    async def run():
+        here[1] = make_order(1, 10)
+        here[2] = make_order(2, 11)
+        await there.open()
+        there[1]["status"] = "accepted"
+        there.save(1)
+        there.complete(2)
+        await there.close()
+
+        accepted = here[1]
+        assert (await here.refresh(1))["status"] == "accepted"
+        assert accepted["status"] == "accepted"
+        # Finished elsewhere: dropped here without writing over it
+        assert await here.refresh(2) is None
+        assert 2 not in here and 11 not in here.by_customer
+        await here.open()
+        await here.close()
+
+    asyncio.run(run())
+    assert [r[1:] for r in rows(path)] == [(1, 10, "accepted"), (2, 11, "completed")]
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_completed_order_stays_gone_before_its_row_is_written(tmp_path, shared):
+    store = OrderStore(str(tmp_path / "orders.db"), shared=shared)
+    store[1] = make_order(1, 10, "accepted")   # Written through: a live row
+
+    async def run():
+        await store.open()
+        store.complete(1)
+        # The final row is still queued; the database only has the live one
+        assert await store.fetch(1) is None
+        assert 1 not in store
+        await store.close()
+        assert await store.fetch(1) is None
+        assert not store.finishing
+
+    asyncio.run(run())
+    assert [r[1:] for r in rows(store.path)] == [(1, 10, "completed")]
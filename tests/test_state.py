@@ -0,0 +1,44 @@
+import asyncio
+
+from state import SharedMap, SQLiteBackend
+
+
+def test_mirror_sees_own_writes_and_other_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    here, there = SQLiteBackend(path, interval=0.01), SQLiteBackend(path)
+    chats = SharedMap(here, "chat_sessions", mirrored=True)
+    theirs = SharedMap(there, "chat_sessions")
+
+    async def run():
+        here.start()
+        chats[1] = 2
+        assert chats.get(1) == 2          # Straight away, from the mirror
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if 1 in theirs:               # Written behind, on the writer thread
+                break
+        theirs[3] = 4
+        del theirs[1]
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if 3 in chats:
+                break
+        assert dict(chats) == {3: 4}
+        chats[5] = 6
+        await here.stop()                 # Flushes what is still queued
+        assert dict(theirs) == {3: 4, 5: 6}
+
+    asyncio.run(run())
+
+
+def test_claims_are_first_writer_wins_across_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    here, there = SQLiteBackend(path), SQLiteBackend(path)
+
+    async def run():
+        assert await here.claim("accept_1", 100)
+        assert not await there.claim("accept_1", 101)
+        assert await there.claim("accept_1", 100)     # Held already
+        assert await there.claim_owner("accept_1") == 100
+
+    asyncio.run(run())
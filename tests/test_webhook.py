@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import httpd
+from webhook import make_handler
+
+
+class FakeApp:
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+
+def message_from(user_id, update_id=1):
+    user = {"id": user_id, "is_bot": False, "first_name": "U"}
+    return json.dumps({"update_id": update_id, "message": {
+        "message_id": 1, "date": 0, "text": "hi", "from": user,
+        "chat": {"id": user_id, "type": "private"},
+    }}).encode()
+
+
+def test_updates_reach_the_worker_that_owns_the_user():
+    async def run():
+        apps = [FakeApp(), FakeApp()]
+        handlers = {}
+        servers, peers = [], []
+        for i in range(len(apps)):
+            server = await httpd.serve(
+                lambda *req, i=i: handlers[i](*req), "127.0.0.1", 0
+            )
+            servers.append(server)
+            peers.append(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+        for i, app in enumerate(apps):
+            handlers[i] = make_handler(app, "/hook", "s", peers=peers, index=i)
+
+        # Whichever worker the balancer picked, user 3 lands on worker 1
+        first = handlers[0]
+        headers = {"x-telegram-bot-api-secret-token": "s"}
+        response = await first("POST", "/hook", headers, message_from(3))
+        assert response.status == 200
+        assert apps[0].update_queue.empty()
+        assert (await apps[1].update_queue.get()).effective_user.id == 3
+
+        response = await first("POST", "/hook", headers, message_from(4, 2))
+        assert response.status == 200
+        assert (await apps[0].update_queue.get()).effective_user.id == 4
+        for server in servers:
+            server.close()
+
+    asyncio.run(run())
+
+
+def test_json_that_is_not_an_update_gets_400():
+    async def run():
+        handle = make_handler(FakeApp(), "/hook", "", peers=[])
+        for body in (b"[1]", b'"x"', b"3", b"null", b"{"):
+            assert (await handle("POST", "/hook", {}, body)).status == 400
+
+    asyncio.run(run())
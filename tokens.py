@@ -0,0 +1,61 @@
+# tokens.py
+import asyncio
+
+import database
+from config import DB_PATH, TOKEN_LEASE_BLOCK
+
+
+class TokenSequencer:
+    """Hands out order tokens from blocks leased out of token_counter.
+
+    Each lease reserves TOKEN_LEASE_BLOCK tokens in one transaction, so
+    tokens stay unique across restarts and across several workers that
+    share the database. Unused tokens of a lease are skipped after a
+    restart, which leaves gaps but never duplicates.
+    """
+
+    def __init__(self, path=DB_PATH, block=TOKEN_LEASE_BLOCK):
+        self.path = path
+        self.block = block
+        self.next_token = 1
+        self.limit = 0            # Last token of the current lease
+        self.conn = None
+        self.lock = asyncio.Lock()
+
+    def take(self):
+        """Next token; leases a new block inline when the current one is used up"""
+        if self.next_token > self.limit:
+            self._lease()
+        token = self.next_token
+        self.next_token += 1
+        return token
+
+    async def next(self):
+        """Like take(), but runs the lease off the event loop"""
+        if self.next_token > self.limit:
+            async with self.lock:
+                if self.next_token > self.limit:
+                    await asyncio.to_thread(self._lease)
+        token = self.next_token
+        self.next_token += 1
+        return token
+
+    def _lease(self):
+        if self.conn is None:
+            self.conn = database.connect(self.path)
+            self.conn.isolation_level = None
+        cur = self.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.execute("SELECT last_token FROM token_counter WHERE id=1")
+            start = cur.fetchone()[0] + 1
+            cur.execute(
+                "UPDATE token_counter SET last_token=? WHERE id=1",
+                (start + self.block - 1,)
+            )
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        self.next_token = start
+        self.limit = start + self.block - 1
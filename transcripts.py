@@ -0,0 +1,188 @@
+# transcripts.py
+# Admin-customer chat transcripts, kept per order for disputes. Each
+# finished conversation is one zlib blob appended to size-bounded segment
+# files; index.jsonl says where every order's blobs are.
+import json
+import os
+import time
+import zlib
+
+from config import TRANSCRIPT_DIR, TRANSCRIPT_SEGMENT_BYTES
+from writer import BatchWriter
+
+SEGMENT_PREFIX = "chats-"
+SEGMENT_FORMAT = "%Y%m%dT%H%M%S"
+INDEX_NAME = "index.jsonl"    # [token, segment, offset, length] per line
+MEDIA_KINDS = ("photo", "video", "voice", "video_note", "audio", "document",
+               "animation", "sticker", "location", "venue", "contact", "poll",
+               "dice")
+
+
+def describe(message):
+    """(kind, text, file_id) of a chat message, for its transcript line"""
+    if message.text:
+        return "text", message.text, None
+    kind = next((k for k in MEDIA_KINDS if getattr(message, k)), "message")
+    media = getattr(message, kind, None)
+    if kind == "photo":
+        media = media[-1]
+    text = message.caption or ""
+    if kind == "location":
+        text = f"{media.latitude},{media.longitude}"
+    elif kind == "venue":
+        text = f"{media.title}, {media.address}"
+    elif kind == "contact":
+        text = media.phone_number
+    return kind, text, getattr(media, "file_id", None)
+
+
+class TranscriptStore:
+    """Chat lines collected per token in memory, written once per chat.
+
+    add() only appends a tuple, so the relay path never touches disk.
+    finish() hands the order's lines to the writer thread, which
+    compresses them as one blob, appends it to the current segment and
+    adds (segment, offset, length) to the index. Reading a transcript
+    back is one seek and one read per chat the order had, usually one.
+    """
+
+    def __init__(self, path=TRANSCRIPT_DIR, segment_bytes=TRANSCRIPT_SEGMENT_BYTES):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.lines = {}       # Token -> [(ts, sender role, kind, text, file_id)]
+        self.touched = {}     # Token -> when its last line was added
+        self.index = {}       # Token -> [(segment name, offset, length)]
+        self.file = None
+        self.segment = None
+        self.size = 0
+        self.writer = BatchWriter(
+            self._write, "Transcript", "chats", done=self._indexed
+        )
+
+    def add(self, token, role, message):
+        self.note(token, role, *describe(message))
+
+    def note(self, token, role, kind, text, file_id=None):
+        """A line without a message behind it, e.g. the tracking link"""
+        now = time.time()
+        self.lines.setdefault(token, []).append(
+            (round(now, 3), role, kind, text, file_id)
+        )
+        self.touched[token] = now
+
+    def finish(self, token):
+        """The chat for this order is over; write what it collected"""
+        lines = self.lines.pop(token, None)
+        self.touched.pop(token, None)
+        if lines:
+            self.writer.put((token, lines))
+
+    def finish_idle(self, now, ttl):
+        """Write chats nobody finished, e.g. ones closed on another worker"""
+        idle = [t for t, at in self.touched.items() if now - at >= ttl]
+        for token in idle:
+            self.finish(token)
+        return len(idle)
+
+    def __len__(self):
+        return len(self.lines)
+
+    # ---------- lifecycle ----------
+    async def open(self):
+        self.index = await self.writer.run(self._load_index)
+        self.writer.start()
+
+    async def close(self):
+        for token in list(self.lines):
+            self.finish(token)
+        await self.writer.stop()
+        await self.writer.run(self._close_files)
+
+    def _indexed(self, written):
+        for token, where in written:
+            self.index.setdefault(token, []).append(where)
+
+    # ---------- reading ----------
+    async def read(self, token):
+        """Every line of the order's chats, oldest first"""
+        stored = await self.writer.run(
+            self._read, list(self.index.get(token, ()))
+        )
+        return stored + list(self.lines.get(token, ()))
+
+    def _read(self, places):
+        lines = []
+        for segment, offset, length in places:
+            with open(os.path.join(self.path, segment), "rb") as f:
+                f.seek(offset)
+                blob = f.read(length)
+            lines.extend(
+                tuple(json.loads(line))
+                for line in zlib.decompress(blob).decode().splitlines()
+            )
+        return lines
+
+    # ---------- files (writer thread) ----------
+    def _write(self, batch):
+        written = []
+        entries = []
+        for token, lines in batch:
+            blob = zlib.compress("\n".join(
+                json.dumps(line, ensure_ascii=False) for line in lines
+            ).encode())
+            if self.file is None or (
+                self.size and self.size + len(blob) > self.segment_bytes
+            ):
+                self._rotate()
+            self.file.write(blob)
+            where = (self.segment, self.size, len(blob))
+            self.size += len(blob)
+            written.append((token, where))
+            entries.append(json.dumps([token, *where]) + "\n")
+        self.file.flush()
+        # Blobs are on disk before the index points at them
+        with open(os.path.join(self.path, INDEX_NAME), "a", encoding="utf-8") as f:
+            f.write("".join(entries))
+        return written
+
+    def _rotate(self):
+        if self.file:
+            self.file.close()
+        os.makedirs(self.path, exist_ok=True)
+        # Always a fresh file, even when the last one started this second
+        stamp = SEGMENT_PREFIX + time.strftime(SEGMENT_FORMAT)
+        self.segment, n = stamp + ".z", 0
+        while os.path.exists(os.path.join(self.path, self.segment)):
+            n += 1
+            self.segment = f"{stamp}-{n}.z"
+        self.file = open(os.path.join(self.path, self.segment), "ab")
+        self.size = 0
+
+    def _load_index(self):
+        index = {}
+        try:
+            with open(os.path.join(self.path, INDEX_NAME), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        token, segment, offset, length = json.loads(line)
+                    except ValueError:
+                        continue    # Torn last line from a crash
+                    index.setdefault(token, []).append((segment, offset, length))
+        except FileNotFoundError:
+            pass
+        return index
+
+    def _close_files(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def render(token, lines):
+    """Plain-text transcript for the main admin"""
+    out = [f"Chat transcript · Token {token}"]
+    for ts, role, kind, text, _ in lines:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        body = text if kind == "text" else f"[{kind}] {text}".rstrip()
+        out.append(f"[{stamp}] {role.capitalize()}: {body}")
+    return "\n".join(out) + "\n"
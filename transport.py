@@ -0,0 +1,95 @@
+# transport.py
+# HTTP clients for the Bot API: one pool for sends, a separate one for
+# getUpdates so a burst of sends never delays polling (or vice versa).
+from functools import lru_cache
+
+import httpx
+from telegram._utils.defaultvalue import DefaultValue
+from telegram.request import BaseRequest
+
+from config import (
+    HTTP_POOL_SIZE,
+    HTTP_VERSION,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_WRITE_TIMEOUT,
+    HTTP_MEDIA_WRITE_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    HTTP_KEEPALIVE,
+)
+from metrics import InstrumentedRequest
+
+
+@lru_cache(maxsize=None)
+def ssl_context():
+    """One CA bundle load for every client instead of one per client"""
+    return httpx.create_ssl_context()
+
+
+@lru_cache(maxsize=None)
+def http_version():
+    if HTTP_VERSION == "1.1":
+        return "1.1"
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("⚠️ HTTP/2 needs the h2 package; using HTTP/1.1")
+        return "1.1"
+    return "2"
+
+
+class TunedRequest(InstrumentedRequest):
+    """InstrumentedRequest with a shared TLS context, a configurable
+    keep-alive expiry and a longer write timeout for uploads only."""
+
+    def __init__(self, media_write_timeout=HTTP_MEDIA_WRITE_TIMEOUT,
+                 keepalive=HTTP_KEEPALIVE, **kwargs):
+        # Read by _build_client(), which the base __init__ calls
+        self.media_write_timeout = media_write_timeout
+        self.keepalive = keepalive
+        super().__init__(**kwargs)
+
+    def _build_client(self):
+        pool = self._client_kwargs["limits"].max_connections
+        self._client_kwargs["limits"] = httpx.Limits(
+            max_connections=pool,
+            max_keepalive_connections=pool,
+            keepalive_expiry=self.keepalive,
+        )
+        self._client_kwargs["verify"] = ssl_context()
+        return super()._build_client()
+
+    async def do_request(self, url, method, request_data=None,
+                         write_timeout=BaseRequest.DEFAULT_NONE, **kwargs):
+        if (
+            isinstance(write_timeout, DefaultValue)
+            and request_data is not None
+            and request_data.multipart_data
+        ):
+            write_timeout = self.media_write_timeout
+        return await super().do_request(
+            url, method, request_data, write_timeout=write_timeout, **kwargs
+        )
+
+
+def send_request():
+    return TunedRequest(
+        connection_pool_size=HTTP_POOL_SIZE,
+        http_version=http_version(),
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        write_timeout=HTTP_WRITE_TIMEOUT,
+        pool_timeout=HTTP_POOL_TIMEOUT,
+    )
+
+
+def get_updates_request():
+    # One long poll at a time; read timeout is extended by the poll timeout
+    return TunedRequest(
+        connection_pool_size=1,
+        http_version=http_version(),
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        write_timeout=HTTP_WRITE_TIMEOUT,
+        pool_timeout=HTTP_POOL_TIMEOUT,
+    )
@@ -0,0 +1,128 @@
+# webhook.py
+# Webhook ingestion: Telegram POSTs updates to an embedded HTTP server
+# instead of the bot long-polling for them.
+import asyncio
+import hmac
+import json
+import signal
+
+import httpx
+from telegram import Update
+
+import httpd
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WORKER_PEERS,
+    WORKER_INDEX,
+)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+FORWARDED_HEADER = "x-bot-forwarded-from"   # Set on updates a peer passed on
+FORWARD_TIMEOUT = 10
+
+
+def owner_of(update, workers):
+    """Index of the worker that handles this update's user (or chat)"""
+    who = update.effective_user or update.effective_chat
+    return who.id % workers if who else None
+
+
+def make_handler(app, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET,
+                 peers=WORKER_PEERS, index=WORKER_INDEX):
+    """HTTP handler that verifies the secret and queues the update.
+
+    app.update_queue is bounded in webhook mode. When it is full the
+    request is answered with 503 so Telegram backs off and redelivers
+    later instead of us buffering without limit. With peers configured,
+    an update whose user belongs to another worker is forwarded there
+    and that worker's answer passed back, so a user's flow never jumps
+    between workers whatever the load balancer does.
+    """
+    if peers and not 0 <= index < len(peers):
+        raise ValueError(f"WORKER_INDEX {index} is not in WORKER_PEERS")
+    client = httpx.AsyncClient(timeout=FORWARD_TIMEOUT) if peers else None
+
+    async def forward(owner, body):
+        try:
+            r = await client.post(
+                peers[owner].rstrip("/") + path, content=body,
+                headers={SECRET_HEADER: secret, FORWARDED_HEADER: str(index),
+                         "content-type": "application/json"},
+            )
+        except httpx.HTTPError as e:
+            print(f"⚠️ Forward to worker {owner} failed: {e}")
+            return httpd.Response(503, "busy", headers={"Retry-After": "1"})
+        return httpd.Response(r.status_code, r.content)
+
+    async def handle(method, req_path, headers, body):
+        if req_path != path:
+            return httpd.Response(404, "not found")
+        if method != "POST":
+            return httpd.Response(405, "method not allowed")
+        if secret and not hmac.compare_digest(
+            headers.get(SECRET_HEADER, ""), secret
+        ):
+            return httpd.Response(401, "bad secret")
+
+        try:
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                raise ValueError("update is not an object")
+            update = Update.de_json(data, app.bot)
+        except (ValueError, TypeError, KeyError):
+            return httpd.Response(400, "bad update")
+
+        if peers and FORWARDED_HEADER not in headers:
+            owner = owner_of(update, len(peers))
+            if owner is not None and owner != index:
+                return await forward(owner, body)
+
+        try:
+            app.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            return httpd.Response(503, "busy", headers={"Retry-After": "1"})
+        return httpd.Response(200, "ok")
+
+    return handle
+
+
+def run_webhook(app):
+    """Blocking entry point, the webhook twin of app.run_polling()"""
+    asyncio.run(_serve(app))
+
+
+async def _serve(app):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+
+    if WEBHOOK_URL:
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES,
+        )
+
+    server = await httpd.serve(make_handler(app), WEBHOOK_LISTEN, WEBHOOK_PORT)
+    await app.start()
+    print(f"🌐 Webhook listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
@@ -0,0 +1,106 @@
+# writer.py
+# The queue and single writer thread behind the journal, the orders table
+# and chat transcripts, so none of them makes the event loop wait on disk.
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BatchWriter:
+    """Items queued on the event loop, written in batches on one thread.
+
+    put() only queues; a task drains the queue and hands each batch to
+    write(batch) on the writer thread, then passes what it returned to
+    done() back on the loop. Before start() and after stop() put() writes
+    inline instead. With `retry` set, a failed batch is kept and written
+    again ahead of newer items every `retry` seconds; without it the
+    failure is reported and the batch dropped. Other work that must not
+    race the writes, like reads of the same files, goes through run().
+    """
+
+    def __init__(self, write, name, unit, done=None, delay=0,
+                 max_batch=None, retry=None):
+        self.write = write
+        self.name = name          # For warnings: "{name} write failed (3 {unit})"
+        self.unit = unit
+        self.done = done          # fn(result of write), on the loop
+        self.delay = delay        # Seconds to let a batch fill up
+        self.max_batch = max_batch
+        self.retry = retry
+        self.queue = None
+        self.task = None
+        self.unwritten = []       # Items of a failed batch, retried first
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"{name.lower()}-writer"
+        )
+
+    def __len__(self):
+        """Items not yet on disk"""
+        return len(self.unwritten) + (self.queue.qsize() if self.queue else 0)
+
+    def put(self, item):
+        if self.queue is None:
+            # Not started (scripts, startup, shutdown); write straight through
+            self._done(self.write([item]))
+        else:
+            self.queue.put_nowait(item)
+
+    async def run(self, fn, *args):
+        """fn(*args) on the writer thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._drain())
+
+    async def stop(self):
+        """Write everything queued; failed items get one last try"""
+        if self.task:
+            await self.queue.join()
+            self.task.cancel()
+            self.task = None
+        self.queue = None
+        if self.unwritten:
+            try:
+                self._done(await self.run(self.write, self.unwritten))
+                self.unwritten = []
+            except Exception as e:
+                print(f"⚠️ {len(self.unwritten)} {self.unit} lost at shutdown: {e}")
+
+    async def _drain(self):
+        while True:
+            batch = []
+            try:
+                # A failed batch is retried even if nothing new comes
+                batch.append(await asyncio.wait_for(
+                    self.queue.get(), self.retry if self.unwritten else None
+                ))
+            except asyncio.TimeoutError:
+                pass
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            while not self.queue.empty() and (
+                self.max_batch is None or len(batch) < self.max_batch
+            ):
+                batch.append(self.queue.get_nowait())
+            # Failed items go first, so newer ones still win
+            items = self.unwritten + batch
+            try:
+                self._done(await self.run(self.write, items))
+                self.unwritten = []
+            except Exception as e:
+                if self.retry:
+                    print(f"⚠️ {self.name} write failed ({len(items)} "
+                          f"{self.unit}), will retry: {e}")
+                    self.unwritten = items
+                else:
+                    print(f"⚠️ {self.name} write failed ({len(items)} "
+                          f"{self.unit}): {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _done(self, result):
+        if self.done is not None:
+            self.done(result)